@@ -22,7 +22,8 @@
 # required:
 # -f1  "pathToFile1"
 # -f2  "pathToFile2"
-# -lp  colNameForLabelsFile1:::colNameForLabelFile2
+# -lp  colNameForLabelsFile1:::colNameForLabelFile2 (a composite label joins several columns with "+": id+date:::ID+Datum)
+# gzip and zstd compressed files (zstd requires zstandard) are found by their magic bytes and decompressed while reading
 
 # modes:
 # -lc  compares the labels of the two files & reports unique labels of each file
@@ -31,10 +32,24 @@
 
 # optionals:
 # -d  delimiter (default is ";") use instead: "," "|" or "\t"
+# -rp  raw parsing: every line is split at each delimiter (by default fields in double quotes are read like RFC 4180)
 # -ucn prints all unique column names to the console
 # -iv  valuesToIgnore
 # -st  "pathToDirectoryToSaveTXT"
 # -sc  "pathToDirectoryToSaveCSV"
+# -sr  "pathToDirectoryToSaveResults" one record per wrong value as parquet (requires pyarrow) or NDJSON (-rf)
+# -cr  "abs=0.01 decimal=, thousands=. trim casefold" compare rules for all pairs (or per pair as third entry in -cp)
+# -sm  stream mode: only the labels are kept in memory, rows are read from disk while comparing
+# -je  join engine: "hash" (default) or "merge" (sort-merge join, sorts unsorted files externally)
+# -nb  numpy backend: compares whole columns at once (requires numpy)
+# -w   number of worker processes for a parallel comparison
+# -bm  "pathToManifest.txt" batch mode: one comparison per row of the manifest
+# -cd  "pathToCacheDirectory" caches the label indices of unchanged files (-cs max size in MB, -nc disables the cache)
+# -ss  "pathToSnapshot" saves row hashes & wrong values, -si "pathToSnapshot" only compares rows changed since then
+# -ps  pre-screen: only labels whose hashed values differ are compared
+# -pr  "pathToProfile.json" saves time, memory and counts of every stage, -pp "pathToStats" cProfile of the compare stage
+# -ks  prints key statistics (rows, distinct labels, duplicates, distinct values per label column) of both files
+# -ode / -odu / -oul  ask (default), continue, fail or report on decode errors / duplicates / unique labels
 
 # COPYRIGHT © 2024 Niklas Max G.
 # This work is licensed under the Creative Commons Attribution-NonCommercial 4.0 International License.
@@ -43,37 +58,373 @@
 
 import csv
 import argparse
+import cProfile
+import gzip
+import io
+import json
+import resource
 import sys
 import os
+import heapq
+import mmap
+import hashlib
+import pickle
+import re
+import tempfile
+import threading
+import time
+import zlib
+import multiprocessing
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack
+from itertools import repeat
+from operator import itemgetter
 from datetime import datetime
-from typing import Tuple, List, Dict, Set
+from typing import Tuple, List, Dict, Set, Iterator
 
+# numpy is only needed for the columnar backend (-nb)
+try:
+    import numpy as np
+except ImportError:
+    np = None
 
-# loads the given csv file into a matrix
-def loadCSVcontent(path, delimiter) -> List[List[str]]:
-    content = [] # is a matrix that resembles the csv table.
+# zstandard is only needed for zstd compressed input files
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+# pyarrow is only needed for the parquet result file (-sr)
+try:
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = None
+    pq = None
+
+# number of rows which are sorted in memory at once by the external merge sort of the merge join engine
+SORT_CHUNK_SIZE = 100_000
+
+# size of the chunks in which a memory mapped file is checked for decode errors
+DECODE_CHECK_CHUNK_SIZE = 16 * 1024 * 1024
+
+# magic bytes at the start of the compressed input files which are decompressed while reading
+COMPRESSION_MAGIC = {b"\x1f\x8b": "gzip", b"\x28\xb5\x2f\xfd": "zstd"}
+
+# magic numbers (little endian) of a zstd frame and of a skippable zstd frame (the last 4 bits are free), a zstd file
+# may start with a skippable frame (pzstd writes one before every frame)
+ZSTD_FRAME_MAGIC = 0xFD2FB528
+ZSTD_SKIPPABLE_MAGIC = 0x184D2A50
+
+# size of the decompressed chunks which the decompression thread writes into the pipe to the parser
+DECOMPRESS_CHUNK_SIZE = 1024 * 1024
+
+# compressed bytes which are decompressed as one task when the blocks of a file are decompressed in parallel
+DECOMPRESS_BATCH_SIZE = 4 * 1024 * 1024
+
+# batches which are decompressed or wait for the parser at the same time (and threads which decompress them).
+# the parser is slower than the decompression, so more batches in flight would only hold more decompressed bytes
+DECOMPRESS_PENDING_BATCHES = 4
+
+# version of the label index cache format, entries of other versions are ignored
+CACHE_VERSION = 4
+
+# first line of every label index cache entry (followed by the version), the rest of the entry is JSON. A cache entry
+# is never unpickled, so a shared cache directory cannot be used to run code
+CACHE_HEADER = "CSVcomparator label index"
+
+# default maximum size of the label index cache in MB, least recently used entries are evicted beyond this size
+DEFAULT_CACHE_SIZE_MB = 1024
+
+# size and number of the blocks which are hashed (besides the first and the last block) to fingerprint a file
+FINGERPRINT_BLOCK_SIZE = 64 * 1024
+FINGERPRINT_BLOCKS = 16
+
+# version of the snapshot format (-ss / -si), snapshots of other versions are not reused
+SNAPSHOT_VERSION = 2
+
+# first line of every snapshot (followed by the version), the rest of the snapshot is JSON, so it is never unpickled
+SNAPSHOT_HEADER = "CSVcomparator snapshot"
+
+# version of the profile format (-pr)
+PROFILE_VERSION = 1
+
+# size of the write buffer of the TXT and CSV reports
+REPORT_BUFFER_SIZE = 1024 * 1024
+
+# number of rows of the CSV report which are sorted in memory at once, more rows are sorted externally with temp files
+REPORT_SORT_CHUNK_SIZE = 100_000
+
+# fields of a record of the result file (-sr), one record per wrong value
+RESULT_FIELDS = ["label", "col1", "col2", "value1", "value2", "row1", "row2"]
+
+# number of records which are collected before they are written into the result file (one row group of a parquet file)
+RESULT_BATCH_SIZE = 65_536
+
+# exit codes of the outcomes of a run. 1 is used for errors and 2 for wrong arguments, the other outcomes are
+# powers of two, so the exit code of a run with the "report" policy is the sum of all reported outcomes
+# (the batch mode also adds the error code 1 if a pair failed)
+EXIT_CODES = {"error": 1, "wrong values": 4, "decode errors": 8, "duplicates": 16, "unique labels": 32}
+
+# the syntax of python floats (see float()), a cell is only converted if it matches, so no exception is raised per cell
+NUMBER_PATTERN = re.compile(r"\s*[+-]?(?:(?:\d(?:_?\d)*(?:\.(?:\d(?:_?\d)*)?)?|\.\d(?:_?\d)*)(?:[eE][+-]?\d(?:_?\d)*)?"
+                            r"|inf|infinity|nan)\s*", re.IGNORECASE)
+
+# separates the columns of a composite label in -lp, e.g. "id+date:::ID+Datum" (a column with a "+" in its name is not split)
+KEY_COLUMN_SEPARATOR = "+"
+
+# joins the values of a composite label into one label. "\" and "|" inside the values are escaped with "\"
+# (only if a value contains one of them), so two different value combinations never get the same label
+LABEL_SEPARATOR = "|"
+
+# number of label shards per worker process of the parallel comparison (more shards balance the load better)
+SHARDS_PER_WORKER = 4
+
+# file contents used by the worker processes of the parallel comparison. Forked workers inherit them from the
+# main process, all other workers re-read the files once in initCompareWorker, so the matrices are never pickled
+workerContents = {}
+
+# the file 1 of the batch mode which is shared by the pairs compared right now
+# {(path, fileNumber): (content, labelSet, labelIndexDic, duplicates, rows with decode error)}, see runBatch
+batchFileCache = {}
+
+# what happens on decode errors, duplicates and unique labels (set by -ode, -odu and -oul), see handleIssue
+issuePolicies = {"decode errors": "ask", "duplicates": "ask", "unique labels": "ask"}
+
+# issues which occurred with the "report" policy, their exit codes are added to the exit code of the run
+reportedIssues = set()
+
+# how the rows are split into fields (set by -rp). By default fields in double quotes may contain the delimiter,
+# line breaks and escaped quotes "" (RFC 4180), with "raw" every line is one row which is split at each delimiter
+parsingOptions = {"raw": False}
+
+# compiled patterns of a complete row per delimiter (see endsInQuotedField)
+completeRowPatterns = {}
+
+
+# raised by the helpers that are shared with the library API (api.py) instead of exiting,
+# the script prints the message and exits with 1
+class ComparatorError(Exception):
+    pass
+
+
+# returns the compression of a file ("gzip" or "zstd") by its magic bytes or None for an uncompressed file
+def getCompression(path):
+    with open(path, "rb") as file:
+        start = file.read(4)
+    for magic, compression in COMPRESSION_MAGIC.items():
+        if start.startswith(magic):
+            return compression
+    if len(start) == 4 and int.from_bytes(start, "little") & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC:
+        return "zstd"
+    return None
+
+
+# opens a csv file for reading in binary mode. A compressed file is decompressed by a background thread which
+# writes into a pipe, so the decompression overlaps with the parsing and nothing is decompressed to disk.
+# the returned file can only be read from start to end (no seek and no mmap).
+# parallel=False decompresses as one stream, for reading only the start of a file
+def openCSV(path, parallel=True):
+    compression = getCompression(path)
+    if compression is None:
+        return open(path, "rb")
+    if compression == "zstd" and zstandard is None:
+        raise ComparatorError(f"{path} is zstd compressed, install zstandard to read it: pip install zstandard")
+
+    readEnd, writeEnd = os.pipe()
+    errors = []
+    threading.Thread(target=writeDecompressed, args=(path, compression, writeEnd, errors, parallel), daemon=True).start()
+    return io.BufferedReader(DecompressedPipe(readEnd, errors), buffer_size=DECOMPRESS_CHUNK_SIZE)
+
+
+# the read end of the pipe of a decompression thread (see openCSV). If the decompression failed,
+# the error is raised at the end of the pipe instead of ending the file early
+class DecompressedPipe(io.FileIO):
+
+    def __init__(self, readEnd, errors):
+        super().__init__(readEnd, "rb")
+        self.errors = errors
+
+    def readinto(self, buffer):
+        size = super().readinto(buffer)
+        if size == 0 and self.errors:
+            raise self.errors[0]
+        return size
+
+    def readall(self):
+        data = super().readall()
+        if self.errors:
+            raise self.errors[0]
+        return data
+
+
+# runs in the decompression thread of openCSV: writes the decompressed file into the pipe. An error is saved into
+# errors before the pipe is closed, so the reader sees it. If the reader closes the pipe early, the thread just ends
+def writeDecompressed(path, compression, writeEnd, errors, parallel=True):
+    pipe = open(writeEnd, "wb")
     try:
-        # open file
-        with open(path, "rb") as file:
-            rowsWithError = [] # contains all row indices that contain a decode error
-            for i, row in enumerate(file):
-                decoded_row = row.decode("UTF-8", errors="replace")
-                
-                if not decoded_row == "": # if row is empty, we don't save it
-                    if decoded_row.count("�") > 0:
-                        rowsWithError.append(i)
-                
-                    split_row = decoded_row.split(delimiter)
-                    content.append(split_row)
-                    
-        if (numberOfErrors := len(rowsWithError)) > 0:
-            print(f"<<<<<<! {numberOfErrors} decode error(s) in File: {path.split('/')[-1]} !>>>>>>")
-            listAllDecodeErrorPositions(content, rowsWithError)
-            if input("\n> Do you want to continue the file comparison with the '�' replacement? y/n\n") not in ["yes", "y"]:
-                sys.exit(1)
-        
+        for chunk in iterDecompressedChunks(path, compression, parallel):
+            pipe.write(chunk)
+    except BrokenPipeError:
+        pass
+    except Exception as e:
+        errors.append(ComparatorError(f"{path} could not be decompressed: {e}"))
+    finally:
+        try:
+            pipe.close()
+        except OSError:
+            pass
+
+
+# yields the decompressed content of a file in chunks. A file of several independent blocks (BGZF gzip files
+# as written by bgzip, zstd files of several frames as written by pzstd) is decompressed in parallel (unless parallel
+# is False), the chunks are still yielded in file order. All other files are decompressed as one stream
+def iterDecompressedChunks(path, compression, parallel=True):
+    blocks = findCompressedBlocks(path, compression) if parallel else None
+    if blocks is not None and len(blocks) > 1 and (os.cpu_count() or 1) > 1:
+        # neighbouring blocks are joined into batches of about DECOMPRESS_BATCH_SIZE compressed bytes
+        batches = [[]]
+        batchSize = 0
+        for block in blocks:
+            if batchSize >= DECOMPRESS_BATCH_SIZE:
+                batches.append([])
+                batchSize = 0
+            batches[-1].append(block)
+            batchSize += block[1]
+
+        # zlib and zstd release the GIL, so the threads decompress on several cores. At most
+        # DECOMPRESS_PENDING_BATCHES batches are in flight, whatever the number of cores
+        workers = min(os.cpu_count(), DECOMPRESS_PENDING_BATCHES)
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            pending = deque()
+            for batch in batches:
+                pending.append(executor.submit(decompressBatch, path, compression, batch))
+                if len(pending) >= DECOMPRESS_PENDING_BATCHES:
+                    yield pending.popleft().result()
+            while pending:
+                yield pending.popleft().result()
+        return
+
+    with open(path, "rb") as compressedFile:
+        if compression == "gzip":
+            with gzip.GzipFile(fileobj=compressedFile) as reader:
+                while chunk := reader.read(DECOMPRESS_CHUNK_SIZE):
+                    yield chunk
+            return
+
+        # each zstd frame gets its own decompressobj, the bytes after the end of a frame start the next one.
+        # unlike the stream reader of zstandard this notices a file which ends inside a frame
+        decompressor = zstandard.ZstdDecompressor()
+        frameDecompressor = None
+        while data := compressedFile.read(DECOMPRESS_CHUNK_SIZE):
+            while data:
+                if frameDecompressor is None:
+                    frameDecompressor = decompressor.decompressobj()
+                yield frameDecompressor.decompress(data)
+                data = b""
+                if frameDecompressor.eof:
+                    data = frameDecompressor.unused_data
+                    frameDecompressor = None
+        if frameDecompressor is not None:
+            raise ComparatorError("the file ends inside a zstd frame")
+
+
+# decompresses a batch of independent blocks [(offset, size), ...] of a compressed file
+def decompressBatch(path, compression, batch) -> bytes:
+    with open(path, "rb") as file:
+        file.seek(batch[0][0])
+        data = file.read(sum(size for _, size in batch))
+    if compression == "gzip":
+        return gzip.decompress(data) # a batch of BGZF blocks is a valid multi member gzip file
+
+    decompressor = zstandard.ZstdDecompressor()
+    chunks = []
+    position = 0
+    for _, size in batch:
+        frame = data[position:position + size]
+        position += size
+        if int.from_bytes(frame[:4], "little") == ZSTD_FRAME_MAGIC: # skippable frames are left out
+            chunks.append(decompressor.decompressobj().decompress(frame))
+    return b"".join(chunks)
+
+
+# returns the independent blocks [(offset, size), ...] of a compressed file: the blocks of a BGZF gzip file
+# (each gzip member has its size in the "BC" extra field) or the frames of a zstd file (found by walking the block
+# headers of each frame). Returns None if the file can only be decompressed as one stream
+def findCompressedBlocks(path, compression):
+    with open(path, "rb") as file:
+        if os.fstat(file.fileno()).st_size == 0:
+            return None
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if compression == "gzip":
+                return findBGZFBlocks(buffer)
+            return findZstdFrames(buffer)
+
+
+# returns the blocks of a BGZF file or None if a member has no BGZF header
+def findBGZFBlocks(buffer):
+    blocks = []
+    offset = 0
+    size = len(buffer)
+    while offset < size:
+        # gzip header: magic, method 8, flags with FEXTRA, ..., XLEN at byte 10, the subfield "BC" holds BSIZE
+        if buffer[offset:offset + 4] != b"\x1f\x8b\x08\x04" or buffer[offset + 12:offset + 16] != b"BC\x02\x00":
+            return None
+        blockSize = int.from_bytes(buffer[offset + 16:offset + 18], "little") + 1
+        if offset + blockSize > size:
+            return None
+        blocks.append((offset, blockSize))
+        offset += blockSize
+    return blocks
+
+
+# returns the frames (and skippable frames) of a zstd file or None if the file is not a sequence of frames
+def findZstdFrames(buffer):
+    frames = []
+    offset = 0
+    size = len(buffer)
+    while offset < size:
+        magic = int.from_bytes(buffer[offset:offset + 4], "little")
+        if magic & 0xFFFFFFF0 == ZSTD_SKIPPABLE_MAGIC: # skippable frame: magic, size and data
+            frameEnd = offset + 8 + int.from_bytes(buffer[offset + 4:offset + 8], "little")
+        elif magic == ZSTD_FRAME_MAGIC:
+            descriptor = buffer[offset + 4]
+            singleSegment = descriptor >> 5 & 1
+            headerSize = 1 + (1 - singleSegment) + [0, 1, 2, 4][descriptor & 3] + \
+                [singleSegment, 2, 4, 8][descriptor >> 6]
+            position = offset + 4 + headerSize
+            lastBlock = False
+            while not lastBlock:
+                blockHeader = int.from_bytes(buffer[position:position + 3], "little")
+                if position + 3 > size or blockHeader >> 1 & 3 == 3: # truncated file or reserved block type
+                    return None
+                lastBlock = blockHeader & 1
+                # an RLE block has one byte of content, raw and compressed blocks have their size in the header
+                position += 3 + (1 if blockHeader >> 1 & 3 == 1 else blockHeader >> 3)
+            frameEnd = position + 4 * (descriptor >> 2 & 1) # content checksum
+        else:
+            return None
+        if frameEnd > size:
+            return None
+        frames.append((offset, frameEnd - offset))
+        offset = frameEnd
+    return frames
+
+
+# loads the given csv file into a matrix and returns it with a dic {row index: split row} of all rows with a decode error
+# if colIndices are given, only these columns are loaded (see readCSVcolumns) and the rows are lists of their values,
+# then the hashes of the rows can be collected in the list rowHashes as well
+def loadCSVcontent(path, delimiter, colIndices=None, rowHashes=None) -> Tuple[List[List[str]], Dict[int, List[str]]]:
+    try:
+        if colIndices is None:
+            content, rowsWithError = readCSVcontent(path, delimiter)
+            errorRows = {i: content[i] for i in rowsWithError}
+        else:
+            content, errorRows = readCSVcolumns(path, delimiter, colIndices, rowHashes)
+        handleDecodeErrors(path, errorRows, list(errorRows))
                     
-        return content
+        return content, errorRows
     
     except FileNotFoundError:
         print(f"<<<<<<! the file {path} could not be found !>>>>>>")
@@ -81,8 +432,440 @@ def loadCSVcontent(path, delimiter) -> List[List[str]]:
     except Exception as e:
         print(f"<<<<<<! An error occurred: {e} !>>>>>>")
         sys.exit(1)
+
+
+# reads the given csv file into a matrix without any user interaction,
+# returns the matrix and the indices of all rows that contain a decode error
+def readCSVcontent(path, delimiter) -> Tuple[List[List[str]], List[int]]:
+    content = [] # is a matrix that resembles the csv table.
+    rowsWithError = [] # contains all row indices that contain a decode error
+    with openCSV(path) as file:
+        if hasQuotedFields(file):
+            content, errorRows = readQuotedCSV(file, delimiter)
+            return content, list(errorRows)
+
+        for i, row in enumerate(file):
+            decoded_row = decodeRow(row)
+            
+            if "�" in decoded_row:
+                rowsWithError.append(i)
+            
+            split_row = decoded_row.split(delimiter)
+            content.append(split_row)
+
+    return content, rowsWithError
         
 
+# reads only the given columns of a csv file: the file is memory mapped, row and field boundaries are found on the
+# raw bytes and only the cells of the given columns are decoded. Returns a matrix whose first row is the full header
+# and all other rows are lists with the values of the given columns in column order (see getColPositions),
+# and a dic {row index: split row} of all rows with a decode error. If a list rowHashes is given, the hash of every
+# row (see getRowHash) is appended to it, so rowHashes[i] belongs to content[i]. The whole row is hashed, so it is
+# already known while the row is split
+def readCSVcolumns(path, delimiter, colIndices, rowHashes=None) -> Tuple[List, Dict[int, List[str]]]:
+    colIndices = sorted(set(colIndices))
+    # the row is only split up to the last needed column, the rest of the row stays one (unused) field
+    maxSplit = colIndices[-1] + 1 if colIndices else 0
+    delimiterBytes = delimiter.encode("UTF-8")
+    content = []
+    with openCSV(path) as file:
+        if not file.seekable(): # a compressed file is read from its decompression pipe, it cannot be memory mapped
+            if parsingOptions["raw"]:
+                content, errorRows = collectRows((decodeRow(row).split(delimiter) for row in file), delimiter,
+                                                 colIndices, checkDecodeErrors=True, rowHashes=rowHashes)
+            else:
+                content, errorRows = readQuotedCSV(file, delimiter, colIndices, rowHashes=rowHashes)
+            return content or [[""]], errorRows
+        if os.fstat(file.fileno()).st_size == 0:
+            return [[""]], {}
+        with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            if not parsingOptions["raw"] and buffer.find(b'"') != -1:
+                return readQuotedCSV(file, delimiter, colIndices, checkDecodeErrors=bool(findDecodeErrors(buffer, delimiter)),
+                                     rowHashes=rowHashes)
+            errorRows = findDecodeErrors(buffer, delimiter)
+            size = len(buffer)
+            start = 0
+            while start < size:
+                end = buffer.find(b"\n", start)
+                if end == -1:
+                    end = size
+                row = buffer[start:end]
+                if row.endswith(b"\r"):
+                    row = row[:-1]
+                start = end + 1
+                if rowHashes is not None:
+                    rowHashes.append(getRowHash(row))
+
+                if not content:
+                    content.append(row.decode("UTF-8", errors="replace").split(delimiter))
+                    continue
+
+                fields = row.split(delimiterBytes, maxSplit)
+                try:
+                    content.append([fields[col].decode("UTF-8", errors="replace") for col in colIndices])
+                except IndexError:
+                    raise ComparatorError(f"row {len(content)} has only {len(fields)} column(s)")
+
+    return content, errorRows
+
+
+# returns True if the rows of a file (opened in binary mode) have to be read by readQuotedCSV:
+# quote-aware parsing is used and the file contains a double quote. Files without quotes are split directly.
+# a decompressed file (see openCSV) cannot be searched in advance, so it is always read quote-aware
+def hasQuotedFields(file) -> bool:
+    if parsingOptions["raw"]:
+        return False
+    if not file.seekable():
+        return True
+    if os.fstat(file.fileno()).st_size == 0:
+        return False
+    with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+        return buffer.find(b'"') != -1
+
+
+# reads a csv file (opened in binary mode) with quoted fields (RFC 4180) with the csv module, so fields in double quotes
+# may contain the delimiter, line breaks and escaped quotes "". Returns the matrix (with colIndices the rows after the
+# header are lists of the values of these columns as in readCSVcolumns) and a dic {row index: row} of all rows with a decode error.
+# the rows are only searched for decode errors if the file has any (checkDecodeErrors=None checks the file first,
+# a decompressed file is checked row by row). rowHashes are collected as in readCSVcolumns
+def readQuotedCSV(file, delimiter, colIndices=None, checkDecodeErrors=None, rowHashes=None) \
+        -> Tuple[List, Dict[int, List[str]]]:
+    if checkDecodeErrors is None:
+        checkDecodeErrors = True
+        if file.seekable():
+            with mmap.mmap(file.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+                checkDecodeErrors = bool(findDecodeErrors(buffer, delimiter))
+
+    textFile = io.TextIOWrapper(file, encoding="UTF-8", errors="replace", newline="")
+    try:
+        return collectRows(iterQuotedRecords(textFile, delimiter), delimiter, colIndices, checkDecodeErrors, rowHashes)
+    except csv.Error as e: # e.g. a field larger than csv.field_size_limit()
+        raise ComparatorError(f"the file could not be parsed: {e}")
+    finally:
+        textFile.detach() # the binary file is closed by the caller
+
+
+# yields the records of a text file parsed by the csv module. A quoted field which is never closed would take
+# the rest of the file into one record, so a record which only ends at the end of the file
+# (the csv module has read past the last line while it was still inside the quoted field) raises a ComparatorError
+def iterQuotedRecords(textFile, delimiter):
+    endOfFile = []
+
+    def iterLines():
+        yield from textFile
+        endOfFile.append(True)
+
+    for row in csv.reader(iterLines(), delimiter=delimiter):
+        if endOfFile:
+            raise getUnclosedQuoteError(delimiter.join(row))
+        yield row
+
+
+# returns the error for a row with a quoted field which is not closed before the end of the file
+def getUnclosedQuoteError(row) -> ComparatorError:
+    return ComparatorError(f"a quoted field is not closed before the end of the file, in the row: {row[:80]!r}")
+
+
+# collects split rows into the matrix of readQuotedCSV (with colIndices the rows after the header are projected)
+# and a dic {row index: row} of all rows with a decode error. The row hashes are taken from the joined row,
+# which is the raw row for a row without quotes
+def collectRows(rows, delimiter, colIndices, checkDecodeErrors, rowHashes=None) -> Tuple[List, Dict[int, List[str]]]:
+    if colIndices is not None:
+        colIndices = sorted(set(colIndices))
+
+    content = []
+    errorRows = {}
+    for i, row in enumerate(rows):
+        if not row:
+            row = [""] # an empty line is one empty field, same as with the split
+        if checkDecodeErrors and "�" in delimiter.join(row):
+            errorRows[i] = row
+        if rowHashes is not None:
+            rowHashes.append(getRowHash(delimiter.join(row).encode("UTF-8")))
+        if colIndices is None or i == 0:
+            content.append(row)
+        else:
+            try:
+                content.append([row[col] for col in colIndices])
+            except IndexError:
+                raise ComparatorError(f"row {i} has only {len(row)} column(s)")
+
+    return content, errorRows
+
+
+# checks the whole buffer for decode errors in one pass: the buffer is decoded in big chunks that end at a line break
+# and only a chunk that fails is decoded again row by row to find the rows with errors.
+# returns a dic {row index: split row} of all rows with a decode error (or a '�' which is already in the file)
+def findDecodeErrors(buffer, delimiter) -> Dict[int, List[str]]:
+    errorRows = {}
+    size = len(buffer)
+    chunkStart = 0
+    rowNumber = 0
+    while chunkStart < size:
+        chunkEnd = min(chunkStart + DECODE_CHECK_CHUNK_SIZE, size)
+        if chunkEnd < size:
+            lineBreak = buffer.find(b"\n", chunkEnd)
+            chunkEnd = size if lineBreak == -1 else lineBreak + 1
+        chunk = buffer[chunkStart:chunkEnd]
+        chunkStart = chunkEnd
+
+        try:
+            chunk.decode("UTF-8")
+            if b"\xef\xbf\xbd" not in chunk: # the UTF-8 bytes of '�'
+                rowNumber += chunk.count(b"\n")
+                continue
+        except UnicodeDecodeError:
+            pass
+
+        rows = chunk.split(b"\n")
+        if rows[-1] == b"": # the chunk ends with a line break
+            rows.pop()
+        for row in rows:
+            decoded_row = decodeRow(row)
+            if "�" in decoded_row:
+                errorRows[rowNumber] = decoded_row.split(delimiter)
+            rowNumber += 1
+
+    return errorRows
+
+
+# decodes a raw row of a csv file without its line break
+def decodeRow(row) -> str:
+    return row.rstrip(b"\r\n").decode("UTF-8", errors="replace")
+
+
+# splits a decoded row into its fields. Rows without a double quote (the common case) are split at the delimiter,
+# rows with quotes are parsed by the csv module (unless -rp is set)
+def splitRow(row, delimiter) -> List[str]:
+    if '"' not in row or parsingOptions["raw"]:
+        return row.split(delimiter)
+    return next(csv.reader([row], delimiter=delimiter), [""])
+
+
+# returns True if a raw row ends inside a quoted field, so the row continues on the next line
+def endsInQuotedField(row, delimiter) -> bool:
+    if delimiter not in completeRowPatterns:
+        # like in the csv module a quote only opens a quoted field at the start of a field, inside it "" is an escaped
+        # quote and the rest of the field after the closing quote is read as it is. The lookahead with the
+        # backreference makes the quoted part atomic, so "" is never split into a closing quote and a literal quote
+        d = re.escape(delimiter.encode("UTF-8"))
+        field = rb'(?:"(?=((?:[^"]+|"")*))\%d"[^%s\n]*|[^"%s\n][^%s\n]*|)'
+        completeRowPatterns[delimiter] = re.compile(field % (1, d, d, d) + rb"(?:" + d + field % (2, d, d, d) +
+                                                    rb")*\n?")
+    return completeRowPatterns[delimiter].fullmatch(row) is None
+
+
+# yields the raw rows of a file opened in binary mode: a line which ends inside a quoted field is joined with the
+# following lines, so a row is always one complete record (and its length is the distance to the next row).
+# a quoted field which is still open at the end of the file raises a ComparatorError (see getUnclosedQuoteError)
+# the lines of a file without any quote are yielded directly
+def iterRows(file, delimiter):
+    if not hasQuotedFields(file):
+        yield from file
+        return
+    lines = iter(file)
+    for row in lines:
+        if b'"' in row:
+            while endsInQuotedField(row, delimiter):
+                if not (line := next(lines, b"")):
+                    raise getUnclosedQuoteError(decodeRow(row))
+                row += line
+        yield row
+
+
+# reads the next raw row of a file opened in binary mode (see iterRows), returns b"" at the end of the file
+def readRow(file, delimiter) -> bytes:
+    row = file.readline()
+    if b'"' in row and not parsingOptions["raw"]:
+        while endsInQuotedField(row, delimiter):
+            if not (line := file.readline()):
+                raise getUnclosedQuoteError(decodeRow(row))
+            row += line
+    return row
+
+
+# reports all decode errors of a file and asks the user if the comparison should be continued
+def handleDecodeErrors(path, content, rowsWithError):
+    if (numberOfErrors := len(rowsWithError)) > 0:
+        print(f"<<<<<<! {numberOfErrors} decode error(s) in File: {path.split('/')[-1]} !>>>>>>")
+        listAllDecodeErrorPositions(content, rowsWithError)
+        handleIssue("decode errors", "\n> Do you want to continue the file comparison with the '�' replacement? y/n\n")
+
+
+# applies the policy of an issue ("decode errors", "duplicates" or "unique labels") after its details were printed:
+# "ask" asks the user whether to continue, "continue" goes on, "fail" exits with the exit code of the issue
+# and "report" goes on but adds the exit code of the issue to the exit code of the run
+def handleIssue(issue, question):
+    policy = issuePolicies[issue]
+    if policy == "ask":
+        try:
+            answer = input(question)
+        except EOFError:
+            answer = "" # a closed stdin (e.g. in a pipeline) is taken as no
+        if answer not in ["yes", "y"]:
+            sys.exit(EXIT_CODES[issue])
+    elif policy == "fail":
+        print(f"> the comparison is stopped because of the {issue} (exit code {EXIT_CODES[issue]})")
+        sys.exit(EXIT_CODES[issue])
+    elif policy == "report":
+        reportedIssues.add(issue)
+
+
+# returns the exit code of a run: the sum of the exit codes of all reported issues and of the wrong values (if any)
+def getExitCode(wrongValuesCounter) -> int:
+    issues = reportedIssues | ({"wrong values"} if wrongValuesCounter else set())
+    return sum(EXIT_CODES[issue] for issue in issues)
+
+
+# indexes the labels of the given csv file without keeping its content in memory (used by the stream mode)
+# returns the header row, a dictionary of {label: index of row}, a dictionary of {label: byte offset of row}
+# (only filled if withOffsets is set) and a dictionary of duplicates {label: [indices of repeated rows]}
+# with a cacheDir the index is reused from the label index cache as long as the file is unchanged
+def indexCSVlabels(path, delimiter, labelColumnNames, fileNumber, withOffsets=False, cacheDir=None,
+                   maxCacheBytes=DEFAULT_CACHE_SIZE_MB * 1024 * 1024) \
+        -> Tuple[List[str], Dict[str, int], Dict[str, int], Dict[str, List[int]]]:
+    columnNameForLabel = labelColumnNames[fileNumber - 1]
+    if cacheDir:
+        cachedIndex = loadCachedIndex(cacheDir, path, delimiter, columnNameForLabel)
+        if cachedIndex is not None and (not withOffsets or cachedIndex["labelOffsetDic"] is not None):
+            handleDecodeErrors(path, cachedIndex["errorRows"], list(cachedIndex["errorRows"]))
+            return cachedIndex["header"], cachedIndex["labelIndexDic"], cachedIndex["labelOffsetDic"] or {}, \
+                cachedIndex["duplicates"]
+        # the offsets are always indexed for the cache, so the entry can be used by every mode
+        withOffsets = True
+
+    header = []
+    labelIndexDic = {}
+    labelOffsetDic = {}
+    duplicates = {}
+    errorRows = {} # contains only the rows with a decode error {row index: split row}
+    try:
+        with open(path, "rb") as file:
+            offset = 0
+            for i, row in enumerate(iterRows(file, delimiter)):
+                rowOffset = offset
+                offset += len(row)
+                decoded_row = decodeRow(row)
+                split_row = splitRow(decoded_row, delimiter)
+                if "�" in decoded_row:
+                    errorRows[i] = split_row
+
+                if i == 0:
+                    header = split_row
+                    getLabel = getLabelGetter(getLabelColIndices(header, columnNameForLabel, fileNumber))
+                    continue
+
+                label = getLabel(split_row)
+                if label not in labelIndexDic:
+                    labelIndexDic[label] = i
+                    if withOffsets:
+                        labelOffsetDic[label] = rowOffset
+                elif label in duplicates:
+                    duplicates[label].append(i)
+                else:
+                    duplicates[label] = [i]
+
+        if cacheDir:
+            saveCachedIndex(cacheDir, path, delimiter, columnNameForLabel, header, labelIndexDic, labelOffsetDic,
+                            duplicates, errorRows, maxCacheBytes)
+
+        handleDecodeErrors(path, errorRows, list(errorRows))
+
+        return header, labelIndexDic, labelOffsetDic, duplicates
+
+    except FileNotFoundError:
+        print(f"<<<<<<! the file {path} could not be found !>>>>>>")
+        sys.exit(1)
+    except ComparatorError as e:
+        print(f"<<<<<<! {e} !>>>>>>")
+        sys.exit(1)
+    except Exception as e:
+        print(f"<<<<<<! An error occurred: {e} !>>>>>>")
+        sys.exit(1)
+
+
+# returns a fingerprint of the content of a file: a hash over the size and the first, the last and some evenly spread
+# blocks of the file. So a changed file is detected without reading the whole file again
+def fileFingerprint(path) -> str:
+    size = os.path.getsize(path)
+    fingerprint = hashlib.blake2b(str(size).encode(), digest_size=16)
+    with open(path, "rb") as file:
+        if size <= FINGERPRINT_BLOCK_SIZE * (FINGERPRINT_BLOCKS + 2):
+            fingerprint.update(file.read())
+        else:
+            lastBlockStart = size - FINGERPRINT_BLOCK_SIZE
+            for blockNumber in range(FINGERPRINT_BLOCKS + 2):
+                file.seek(lastBlockStart * blockNumber // (FINGERPRINT_BLOCKS + 1))
+                fingerprint.update(file.read(FINGERPRINT_BLOCK_SIZE))
+    return fingerprint.hexdigest()
+
+
+# returns the path of the cache entry of a file, one entry exists per file, delimiter and label column
+def getCachePath(cacheDir, path, delimiter, columnNameForLabel) -> str:
+    # the rows of a file with quoted fields are different with -rp, so both parsings have their own entry
+    key = "\0".join([os.path.abspath(path), delimiter, columnNameForLabel, "raw" if parsingOptions["raw"] else "quoted"])
+    return os.path.join(cacheDir, hashlib.blake2b(key.encode(), digest_size=16).hexdigest() + ".idx")
+
+
+# returns the cached label index of a file as dic or None if there is no entry or the file changed since it was cached
+def loadCachedIndex(cacheDir, path, delimiter, columnNameForLabel):
+    cachePath = getCachePath(cacheDir, path, delimiter, columnNameForLabel)
+    try:
+        stat = os.stat(path)
+        with open(cachePath, "r", encoding="UTF-8") as cacheFile:
+            if cacheFile.readline() != f"{CACHE_HEADER} {CACHE_VERSION}\n":
+                return None
+            entry = json.load(cacheFile)
+        if (entry["size"] != stat.st_size or entry["mtime"] != stat.st_mtime_ns
+                or entry["fingerprint"] != fileFingerprint(path)):
+            return None
+        os.utime(cachePath) # marks the entry as recently used for the LRU eviction
+        return {"header": entry["header"], "labelIndexDic": dict(zip(entry["labels"], entry["rows"])),
+                "labelOffsetDic": None if entry["offsets"] is None else dict(zip(entry["labels"], entry["offsets"])),
+                "duplicates": dict(entry["duplicates"]), "errorRows": dict(entry["errorRows"])}
+    except Exception:
+        return None # a missing or broken cache entry is just a cache miss
+
+
+# saves the label index of a file into the cache and evicts the least recently used entries
+# if the cache gets bigger than maxCacheBytes. The labelOffsetDic can be None if the offsets are unknown
+def saveCachedIndex(cacheDir, path, delimiter, columnNameForLabel, header, labelIndexDic, labelOffsetDic, duplicates,
+                    errorRows, maxCacheBytes):
+    try:
+        os.makedirs(cacheDir, exist_ok=True)
+        stat = os.stat(path)
+        # the labels are stored once, the rows and offsets are lists in the same order (dicts keep their order)
+        entry = {"size": stat.st_size, "mtime": stat.st_mtime_ns, "fingerprint": fileFingerprint(path),
+                 "header": header, "labels": list(labelIndexDic), "rows": list(labelIndexDic.values()),
+                 "offsets": None if labelOffsetDic is None else [labelOffsetDic[label] for label in labelIndexDic],
+                 "duplicates": list(duplicates.items()), "errorRows": list(errorRows.items())}
+        cachePath = getCachePath(cacheDir, path, delimiter, columnNameForLabel)
+        # written to a temp file first, so a concurrent run never reads a half written entry
+        with tempfile.NamedTemporaryFile("w", encoding="UTF-8", dir=cacheDir, suffix=".tmp",
+                                         delete=False) as cacheFile:
+            cacheFile.write(f"{CACHE_HEADER} {CACHE_VERSION}\n")
+            json.dump(entry, cacheFile, ensure_ascii=False, separators=(",", ":"))
+        os.replace(cacheFile.name, cachePath)
+        evictCache(cacheDir, maxCacheBytes)
+    except Exception as e:
+        print(f"<<<<<<! the label index of {path} could not be cached: {e} !>>>>>>")
+
+
+# deletes the least recently used cache entries until the cache is not bigger than maxCacheBytes
+def evictCache(cacheDir, maxCacheBytes):
+    entries = []
+    for entry in os.scandir(cacheDir):
+        if entry.is_file() and entry.name.endswith(".idx"):
+            entryStat = entry.stat()
+            entries.append((entryStat.st_mtime, entryStat.st_size, entry.path))
+    totalBytes = sum(size for _, size, _ in entries)
+    for _, size, entryPath in sorted(entries):
+        if totalBytes <= maxCacheBytes:
+            break
+        os.remove(entryPath)
+        totalBytes -= size
+
+
 # prints out all row and col number in whoch decoding problems accoured
 def listAllDecodeErrorPositions(content, rowsWithError):
     print("   row   |   col   |   content of effected cell")
@@ -106,95 +889,927 @@ def splitPair(pair) -> List[str]:
     return pair.split(sep=":::")
 
 
-# returns set of all labels of file <fileNumber>
-# and a dictionary of {label: index of label in fileContent} (index of label in fileContent starts at 1)
-def getLabelSetAndIndexDic(labelColumnNames, fileNumber, content) -> Tuple[Set[str], Dict[str, int], Dict[str, List[int]]]:
-    columnNameForLabel = labelColumnNames[fileNumber - 1]
-    try:
-        labelColIndex = content[0].index(columnNameForLabel)
-        # A List of all labels WITHOUT the colName of the LabelCol
-        labelList = []
-        seen = set()
-        labelIndexDic = {}
-        duplicates = {}
-        for index, row in enumerate(content[1:], start=1): # start = 1 because first row (header) is excluded
-            label = row[labelColIndex]
-            if label not in seen:
-                labelList.append(label)
-                labelIndexDic.update({label: index})
-                seen.add(label)
-            elif label in duplicates:
-                duplicates[label].append(index)
-            else:
-                duplicates[label] = [index]
-                
+# returns the set of all labels of file <fileNumber> (a view of the keys of the index, so no second copy is kept),
+# a dictionary of {label: index of label in fileContent} (index of label in fileContent starts at 1)
+# and the duplicates {label: [indices of repeated rows]}, all found in one pass over the rows
+# colPositions are needed if only some columns of the file were loaded (see getColPositions)
+def getLabelSetAndIndexDic(labelColumnNames, fileNumber, content, colPositions=None) \
+        -> Tuple[Set[str], Dict[str, int], Dict[str, List[int]]]:
+    getLabel = getLabelGetter(getLabelColIndices(content[0], labelColumnNames[fileNumber - 1], fileNumber, colPositions))
+    labelIndexDic = {}
+    duplicates = {}
+    for index, row in enumerate(content[1:], start=1): # start = 1 because first row (header) is excluded
+        label = getLabel(row)
+        if label not in labelIndexDic:
+            labelIndexDic[label] = index
+        elif label in duplicates:
+            duplicates[label].append(index)
+        else:
+            duplicates[label] = [index]
+
+    return labelIndexDic.keys(), labelIndexDic, duplicates
+
+
+# returns the names of the label column(s) of a file. A name that is a column of the header is never split,
+# otherwise a composite label "id+date" is split into its columns ["id", "date"]
+def getLabelColumns(columnNameForLabel, header) -> List[str]:
+    if columnNameForLabel in header:
+        return [columnNameForLabel]
+    return columnNameForLabel.split(KEY_COLUMN_SEPARATOR)
+
+
+# returns the indices of the label column(s) of file <fileNumber> in its header
+# (with colPositions their positions in the loaded rows, see getColPositions)
+def getLabelColIndices(header, columnNameForLabel, fileNumber, colPositions=None) -> List[int]:
+    labelColIndices = []
+    for colName in getLabelColumns(columnNameForLabel, header):
+        if colName not in header:
+            raise ComparatorError(f"Column name: '{colName}' in file {fileNumber} cannot be found")
+        labelColIndices.append(header.index(colName))
+    if colPositions is not None:
+        labelColIndices = [colPositions[index] for index in labelColIndices]
+    return labelColIndices
+
+
+# returns a function which returns the label of a row.
+# a single label column is looked up directly, the values of a composite label are joined with LABEL_SEPARATOR
+def getLabelGetter(labelColIndices):
+    if len(labelColIndices) == 1:
+        return itemgetter(labelColIndices[0])
+
+    getValues = itemgetter(*labelColIndices)
+    separators = len(labelColIndices) - 1
+
+    def getLabel(row):
+        values = getValues(row)
+        label = LABEL_SEPARATOR.join(values)
+        # escaped labels always contain a "\" and unescaped ones never, so both kinds can not collide
+        if "\\" in label or label.count(LABEL_SEPARATOR) != separators:
+            label = LABEL_SEPARATOR.join(value.replace("\\", "\\\\").replace(LABEL_SEPARATOR, "\\" + LABEL_SEPARATOR)
+                                         for value in values)
+        return label
+
+    return getLabel
+
+
+# splits a composite label into the values of its columns (the reverse of getLabelGetter)
+def splitLabel(label) -> List[str]:
+    if "\\" not in label:
+        return label.split(LABEL_SEPARATOR)
+    values = [""]
+    escaped = False
+    for char in label:
+        if escaped:
+            values[-1] += char
+            escaped = False
+        elif char == "\\":
+            escaped = True
+        elif char == LABEL_SEPARATOR:
+            values.append("")
+        else:
+            values[-1] += char
+    return values
+
+
+# returns the statistics of the label index of a file: number of rows, distinct labels, labels with duplicates,
+# repeated rows and the most occurrences of one label. For a composite label the distinct values of every
+# label column are counted as well. Only the index is used, so the file is not read again
+def getKeyStatistics(labelIndexDic, duplicates, labelColumns) -> Dict[str, object]:
+    repeatedRows = sum(len(indices) for indices in duplicates.values())
+    statistics = {"rows": len(labelIndexDic) + repeatedRows, "distinct labels": len(labelIndexDic),
+                  "labels with duplicates": len(duplicates), "repeated rows": repeatedRows,
+                  "max occurrences": 1 + max(map(len, duplicates.values()), default=0) if labelIndexDic else 0}
+    if len(labelColumns) > 1:
+        distinctValues = [set() for _ in labelColumns]
+        for label in labelIndexDic:
+            for values, value in zip(distinctValues, splitLabel(label)):
+                values.add(value)
+        statistics["distinct values"] = {colName: len(values) for colName, values in zip(labelColumns, distinctValues)}
+    return statistics
+
+
+# same as getLabelSetAndIndexDic but the label index is taken from the label index cache (if a cacheDir is given)
+# as long as the file is unchanged, otherwise it is built and saved into the cache together with the errorRows of the
+# file (see loadCSVcontent), so the stream mode reports the same decode errors when it uses this entry
+def getLabelSetAndIndexDicCached(labelColumnNames, fileNumber, content, errorRows, path, delimiter, cacheDir,
+                                 maxCacheBytes, colPositions=None) -> Tuple[Set[str], Dict[str, int], Dict[str, List[int]]]:
+    if not cacheDir:
+        return getLabelSetAndIndexDic(labelColumnNames, fileNumber, content, colPositions)
 
-        return set(labelList), labelIndexDic, duplicates
+    columnNameForLabel = labelColumnNames[fileNumber - 1]
+    cachedIndex = loadCachedIndex(cacheDir, path, delimiter, columnNameForLabel)
+    if cachedIndex is not None:
+        return cachedIndex["labelIndexDic"].keys(), cachedIndex["labelIndexDic"], cachedIndex["duplicates"]
 
-    except ValueError:
-        print(f"<<<<<<! Column name: '{columnNameForLabel}' in file {fileNumber} cannot be found !>>>>>>")
-        sys.exit(1)
+    labelSet, labelIndexDic, duplicates = getLabelSetAndIndexDic(labelColumnNames, fileNumber, content, colPositions)
+    # the byte offsets are unknown here, they are added by the stream mode the next time it indexes this file
+    saveCachedIndex(cacheDir, path, delimiter, columnNameForLabel, content[0], labelIndexDic, None, duplicates,
+                    errorRows, maxCacheBytes)
+    return labelSet, labelIndexDic, duplicates
 
 
 # returns a Dictionary with {label: index in header row of content}
-def getColNameIndexDic(colPairs, fileContent, fileNumber) -> Dict[str, int]:
+# (with colPositions {label: position in the loaded rows}, see getColPositions)
+def getColNameIndexDic(colPairs, fileContent, fileNumber, colPositions=None) -> Dict[str, int]:
     # saves all Names of columns of one File inside a list per file
     inputtedColNamesFile = [name[fileNumber - 1] for name in colPairs]
 
-    try:
-        colNameDicFile = {}
-        for name in inputtedColNamesFile:
-            try:
-                colNameDicFile[name] = fileContent[0].index(name)
-            except ValueError:
-                print(f"<<<<<<! label: '{name}' is not present in file {fileNumber} !>>>>>>")
-                sys.exit(1)
-        return colNameDicFile
-    except Exception as e:
-        print(f"<<<<<<! something went wrong {e}")
-        sys.exit(1)
+    colNameDicFile = {}
+    for name in inputtedColNamesFile:
+        try:
+            colNameDicFile[name] = fileContent[0].index(name)
+        except ValueError:
+            raise ComparatorError(f"label: '{name}' is not present in file {fileNumber}")
+    if colPositions is not None:
+        colNameDicFile = {name: colPositions[index] for name, index in colNameDicFile.items()}
+    return colNameDicFile
+
+
+# returns all pairs in a colPairs Matrix [[colNameFile1, colNameFile2] [colNameFile1, colNameFile2], ...]
+# from the column pair file and (if autoPairMode is set) all columns with the same name in both headers
+def getColPairs(columnNamePairPath, autoPairMode, headerFile1, headerFile2, labelColumnNames) -> List[List[str]]:
+    colPairs = []
+    if columnNamePairPath:
+        try:
+            with open(columnNamePairPath, "r") as colNamePairFile:
+                # only split and append if the line is not empty (last if checks if line is empty)
+                colPairs = [splitPair(pair.strip()) for pair in colNamePairFile if pair.strip()]
+        except Exception as e:
+            print(f"<<<<<<! An error occurred: {e} !>>>>>>")
+            sys.exit(1)
+        for pair in colPairs:
+            if len(pair) not in [2, 3]:
+                raise ComparatorError(f"the column pair '{':::'.join(pair)}' has to be colNameFile1:::colNameFile2 " +
+                                      "or colNameFile1:::colNameFile2:::compareRules")
+
+    # find all columns with the same name that are not already in the ColPairs list and do not occure in the LabelColumnNames
+    # first check is to prevent the same column to be compared twice
+    # second check is to prevent the label columns to be compared (also the single columns of a composite label)
+    if autoPairMode:
+        labelColumns = getLabelColumns(labelColumnNames[0], headerFile1) + getLabelColumns(labelColumnNames[1], headerFile2)
+        for colName in headerFile1:
+            if colName in headerFile2 and colName not in labelColumns and \
+                    [colName, colName] not in [pair[:2] for pair in colPairs]:
+                colPairs.append([colName, colName])
+
+    return colPairs
+
+
+# returns the indices of all columns of a file which are needed for the comparison (label column(s) and paired columns)
+def getNeededColIndices(header, columnNameForLabel, colNameDicFile) -> List[int]:
+    neededColIndices = list(colNameDicFile.values())
+    for colName in getLabelColumns(columnNameForLabel, header):
+        if colName in header: # a missing label column is reported by getLabelSetAndIndexDic
+            neededColIndices.append(header.index(colName))
+    return neededColIndices
+
+
+# returns a dic {col index in the header: position in a row} for rows that were loaded with only the given columns
+# (see readCSVcolumns), so the column indices are translated once instead of looking up every cell by col index
+def getColPositions(colIndices) -> Dict[int, int]:
+    return {col: position for position, col in enumerate(sorted(set(colIndices)))}
 
 
 # This is the actual comparison of the corresponding values,
-# it returns None if all vals are equal
-# else it returns a dic with {label: the position of the mismatched values}
+# it returns a dic with {label: the position of the mismatched values} (empty if all vals are equal)
 def compareValues(colPairs, labelIntersection, file1Content, file2Content, labelDicFile1, labelDicFile2,
                   colNameDicFile1, colNameDicFile2, ignoreValuesList) -> Dict[str, List[List[str]]]:
-    wrongValuesCoordinates = {}
+    return dict(iterCompareValues(colPairs, labelIntersection, file1Content, file2Content, labelDicFile1, labelDicFile2,
+                                  colNameDicFile1, colNameDicFile2, ignoreValuesList))
+
+
+# same comparison as compareValues but the wrong values are yielded as (label, the position of the mismatched values)
+# one label after another, so they can be written into the reports without collecting them in memory
+def iterCompareValues(colPairs, labelIntersection, file1Content, file2Content, labelDicFile1, labelDicFile2,
+                      colNameDicFile1, colNameDicFile2, ignoreValuesList) -> Iterator[Tuple[str, List[List[str]]]]:
+    comparePlan = getComparePlan(colPairs, colNameDicFile1, colNameDicFile2, ignoreValuesList)
     for label in labelIntersection:
+        wrongValuesOfRow = compareRow(comparePlan, file1Content[labelDicFile1.get(label)], file2Content[labelDicFile2.get(label)])
+        if wrongValuesOfRow is not None:
+            yield label, wrongValuesOfRow
+
+
+# same comparison as compareValues but column by column with numpy (used by the numpy backend)
+def compareValuesColumnar(colPairs, labelIntersection, file1Content, file2Content, labelDicFile1, labelDicFile2,
+                          colNameDicFile1, colNameDicFile2, ignoreValuesList) -> Dict[str, List[List[str]]]:
+    return dict(iterCompareValuesColumnar(colPairs, labelIntersection, file1Content, file2Content, labelDicFile1,
+                                          labelDicFile2, colNameDicFile1, colNameDicFile2, ignoreValuesList))
+
+
+# same as iterCompareValues but column by column with numpy:
+# every paired column is parsed once into a float array with a mask of the cells that are numbers,
+# the rows of both files are aligned by label through index arrays and whole columns are compared at once
+def iterCompareValuesColumnar(colPairs, labelIntersection, file1Content, file2Content, labelDicFile1, labelDicFile2,
+                              colNameDicFile1, colNameDicFile2, ignoreValuesList) -> Iterator[Tuple[str, List[List[str]]]]:
+    labels = list(labelIntersection)
+    rowIndicesFile1 = [labelDicFile1.get(label) for label in labels]
+    rowIndicesFile2 = [labelDicFile2.get(label) for label in labels]
+    ignoreValuesSet = set(ignoreValuesList)
+
+    # a column can be used in more than one pair, so every column is only parsed once
+    parsedColumnsFile1 = {}
+    parsedColumnsFile2 = {}
+
+    mismatchMasks = []
+    pairColumns = []
+    for pair in colPairs:
+        rules = getPairRules(pair)
+        # a column is parsed once per rules (the rules decide how its cells are normalized and converted)
+        keyFile1 = (colNameDicFile1.get(pair[0]), formatCompareRules(rules))
+        keyFile2 = (colNameDicFile2.get(pair[1]), formatCompareRules(rules))
+        if keyFile1 not in parsedColumnsFile1:
+            parsedColumnsFile1[keyFile1] = parseColumn(file1Content, rowIndicesFile1, keyFile1[0], ignoreValuesSet, rules)
+        if keyFile2 not in parsedColumnsFile2:
+            parsedColumnsFile2[keyFile2] = parseColumn(file2Content, rowIndicesFile2, keyFile2[0], ignoreValuesSet, rules)
+        stringsFile1, normalizedFile1, floatsFile1, isNumberFile1, isIgnoredFile1 = parsedColumnsFile1[keyFile1]
+        stringsFile2, normalizedFile2, floatsFile2, isNumberFile2, isIgnoredFile2 = parsedColumnsFile2[keyFile2]
+
+        # equal (normalized) strings are equal, two numbers are compared as floats (same as in getComparator)
+        equal = (normalizedFile1 == normalizedFile2) | \
+            (isNumberFile1 & isNumberFile2 & getNumbersEqualColumns(rules, floatsFile1, floatsFile2))
+        mismatchMasks.append(~equal & ~isIgnoredFile1 & ~isIgnoredFile2)
+        pairColumns.append((stringsFile1, stringsFile2))
+
+    if not mismatchMasks:
+        return
+
+    mismatches = np.vstack(mismatchMasks)
+    for row in np.flatnonzero(mismatches.any(axis=0)):
+        wrongValuesOfRow = []
+        for pairIndex, pair in enumerate(colPairs):
+            if mismatches[pairIndex, row]:
+                stringsFile1, stringsFile2 = pairColumns[pairIndex]
+                wrongValuesOfRow.append([pair[0], stringsFile1[row], pair[1], stringsFile2[row]])
+            else:
+                wrongValuesOfRow.append(None)
+        yield labels[row], wrongValuesOfRow
+
+
+# parses the cells of one column (in the order of rowIndices) into typed arrays with the compare rules of the pair,
+# returns the cells as strings, as normalized strings (trim / casefold), as floats, a mask of the cells that are numbers
+# and a mask of the ignored cells
+def parseColumn(content, rowIndices, colIndex, ignoreValuesSet, rules):
+    cells = [content[index][colIndex] for index in rowIndices]
+    strings = np.array(cells, dtype=object)
+    normalize = getStringNormalizer(rules)
+    normalized = strings if normalize is None else np.array([normalize(cell) for cell in cells], dtype=object)
+
+    parseNumber = getNumberParser(rules)
+    floats = np.zeros(len(cells), dtype=np.float64)
+    isNumber = np.zeros(len(cells), dtype=bool)
+    if parseNumber is not None:
+        clean = getNumberCleaner(rules)
+        try:
+            # fast path: the whole column consists of numbers
+            floats = np.array(cells if clean is None else [clean(cell) for cell in cells], dtype=object).astype(np.float64)
+            isNumber[:] = True
+        except ValueError:
+            for i, cell in enumerate(cells):
+                number = parseNumber(cell)
+                if number is not None:
+                    floats[i] = number
+                    isNumber[i] = True
+    isIgnored = np.fromiter((cell in ignoreValuesSet for cell in cells), dtype=bool, count=len(cells))
+    return strings, normalized, floats, isNumber, isIgnored
+
+
+# same as getNumbersEqual but for whole columns, returns a mask of the equal numbers
+def getNumbersEqualColumns(rules, floatsFile1, floatsFile2):
+    absoluteTolerance = rules.get("abs", 0.0)
+    relativeTolerance = rules.get("rel", 0.0)
+    if not absoluteTolerance and not relativeTolerance:
+        return floatsFile1 == floatsFile2
+    with np.errstate(invalid="ignore"): # inf - inf is nan, which is never within the tolerance
+        tolerance = np.maximum(absoluteTolerance, relativeTolerance * np.maximum(np.abs(floatsFile1), np.abs(floatsFile2)))
+        return (floatsFile1 == floatsFile2) | (np.abs(floatsFile1 - floatsFile2) <= tolerance)
+
+
+# same as iterCompareValues but the labels are split into shards which are compared by a pool of worker processes.
+# The shards are yielded in label order, so the output does not depend on which worker finished first.
+# colIndices are the columns the contents were loaded with (see loadCSVcontent, None for all columns)
+def iterCompareValuesParallel(workers, colPairs, labelIntersection, path1, path2, delimiter, file1Content, file2Content,
+                              labelDicFile1, labelDicFile2, colNameDicFile1, colNameDicFile2, ignoreValuesList,
+                              numpyBackend=False, colIndices=(None, None)) -> Iterator[Tuple[str, List[List[str]]]]:
+    labels = sorted(labelIntersection)
+    shardSize = max(1, -(-len(labels) // (workers * SHARDS_PER_WORKER)))
+    # a shard only holds the labels with their row indices, the rows itself are taken from workerContents
+    shards = [[(label, labelDicFile1.get(label), labelDicFile2.get(label)) for label in labels[i:i + shardSize]]
+              for i in range(0, len(labels), shardSize)]
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+        workerContents["file1"] = file1Content
+        workerContents["file2"] = file2Content
+    else:
+        context = multiprocessing.get_context()
 
-        wrongValuesCoordinates.update({label: []})
-        noWrongValue = True
+    try:
+        with ProcessPoolExecutor(max_workers=workers, mp_context=context, initializer=initCompareWorker,
+                                 initargs=(path1, path2, delimiter, parsingOptions["raw"], colIndices)) as executor:
+            results = executor.map(compareShard, shards, repeat(colPairs), repeat(colNameDicFile1), repeat(colNameDicFile2),
+                                   repeat(ignoreValuesList), repeat(numpyBackend))
+            for wrongValuesOfShard in results:
+                yield from wrongValuesOfShard.items()
 
-        for pair in colPairs:
-            file1Value = file1Content[labelDicFile1.get(label)][colNameDicFile1.get(pair[0])]
-            file2Value = file2Content[labelDicFile2.get(label)][colNameDicFile2.get(pair[1])]
+    except Exception as e:
+        print(f"<<<<<<! An error occurred in a worker process: {e} !>>>>>>")
+        sys.exit(1)
+    finally:
+        workerContents.clear()
 
-            file1ValueString = str(file1Value)
-            file2ValueString = str(file2Value)
 
-            # if the values are empty or not of type number, we can't compare them as floats.
+# loads the file contents into a worker process of the parallel comparison (if they were not inherited by forking)
+def initCompareWorker(path1, path2, delimiter, rawParsing, colIndices):
+    parsingOptions["raw"] = rawParsing
+    if not workerContents:
+        for key, path, colIndicesOfFile in [("file1", path1, colIndices[0]), ("file2", path2, colIndices[1])]:
+            if colIndicesOfFile is None:
+                workerContents[key], _ = readCSVcontent(path, delimiter)
+            else:
+                workerContents[key], _ = readCSVcolumns(path, delimiter, colIndicesOfFile)
+
+
+# compares all labels of one shard inside a worker process, returns the wrong values of this shard
+def compareShard(shard, colPairs, colNameDicFile1, colNameDicFile2, ignoreValuesList, numpyBackend) \
+        -> Dict[str, List[List[str]]]:
+    labels = [label for label, _, _ in shard]
+    labelDicFile1 = {label: indexFile1 for label, indexFile1, _ in shard}
+    labelDicFile2 = {label: indexFile2 for label, _, indexFile2 in shard}
+    compare = compareValuesColumnar if numpyBackend else compareValues
+    return compare(colPairs, labels, workerContents["file1"], workerContents["file2"], labelDicFile1, labelDicFile2,
+                   colNameDicFile1, colNameDicFile2, ignoreValuesList)
+
+
+# compares the values of all column pairs of one row of file 1 with one row of file 2 (see getComparePlan),
+# returns None if all vals are equal else a list with one entry per column pair (None for equal values)
+def compareRow(comparePlan, file1Row, file2Row) -> List[List[str]]:
+    wrongValuesOfRow = None
+    for position, (pair, colIndexFile1, colIndexFile2, isEqual) in enumerate(comparePlan):
+        file1Value = file1Row[colIndexFile1]
+        file2Value = file2Row[colIndexFile2]
+
+        # if the values are not the same, we append the column names and the wrong values to the list
+        if not isEqual(file1Value, file2Value):
+            if wrongValuesOfRow is None:
+                wrongValuesOfRow = [None] * len(comparePlan)
+            wrongValuesOfRow[position] = [pair[0], file1Value, pair[1], file2Value]
+
+    return wrongValuesOfRow
+
+
+# compiles the comparison of every column pair once before the rows are compared,
+# returns a list of (pair, col index in file 1, col index in file 2, isEqual function of the pair)
+def getComparePlan(colPairs, colNameDicFile1, colNameDicFile2, ignoreValuesList) -> List[tuple]:
+    ignoreValuesSet = set(ignoreValuesList)
+    return [(pair, colNameDicFile1.get(pair[0]), colNameDicFile2.get(pair[1]),
+             getComparator(getPairRules(pair), ignoreValuesSet)) for pair in colPairs]
+
+
+# returns the isEqual(file1Value, file2Value) function of a column pair with the given compare rules:
+# identical cells and ignored values are always equal, all other cells are equal if they are equal after trim / casefold
+# or if both are numbers which are equal (within the tolerance). Which of these steps are needed is decided here once,
+# so only the steps of the rules are done for the (few) cells that are not identical
+def getComparator(rules, ignoreValuesSet):
+    normalize = getStringNormalizer(rules)
+    parseNumber = getNumberParser(rules)
+    numbersEqual = getNumbersEqual(rules)
+
+    if parseNumber is None and normalize is None:
+        def isEqualDifferentCells(file1Value, file2Value):
+            return False
+    elif parseNumber is None:
+        def isEqualDifferentCells(file1Value, file2Value):
+            return normalize(file1Value) == normalize(file2Value)
+    elif normalize is None:
+        def isEqualDifferentCells(file1Value, file2Value):
+            file1Number = parseNumber(file1Value)
+            if file1Number is None:
+                return False
+            file2Number = parseNumber(file2Value)
+            return file2Number is not None and numbersEqual(file1Number, file2Number)
+    else:
+        def isEqualDifferentCells(file1Value, file2Value):
+            file1Value = normalize(file1Value)
+            file2Value = normalize(file2Value)
+            if file1Value == file2Value:
+                return True
+            file1Number = parseNumber(file1Value)
+            if file1Number is None:
+                return False
+            file2Number = parseNumber(file2Value)
+            return file2Number is not None and numbersEqual(file1Number, file2Number)
+
+    def isEqual(file1Value, file2Value):
+        if file1Value == file2Value or file1Value in ignoreValuesSet or file2Value in ignoreValuesSet:
+            return True
+        return isEqualDifferentCells(file1Value, file2Value)
+
+    return isEqual
+
+
+# returns a function which trims and / or casefolds a string (None if neither is set in the rules)
+def getStringNormalizer(rules):
+    if rules.get("trim") and rules.get("casefold"):
+        return lambda value: value.strip().casefold()
+    if rules.get("trim"):
+        return str.strip
+    if rules.get("casefold"):
+        return str.casefold
+    return None
+
+
+# returns a function which removes the thousands separator and replaces the decimal sign of a number by a "."
+# (None if the numbers are written like python floats)
+def getNumberCleaner(rules):
+    thousands = rules.get("thousands")
+    decimal = rules.get("decimal", ".")
+    if thousands and decimal != ".":
+        return lambda value: value.replace(thousands, "").replace(decimal, ".")
+    if thousands:
+        return lambda value: value.replace(thousands, "")
+    if decimal != ".":
+        return lambda value: value.replace(decimal, ".")
+    return None
+
+
+# returns a function which converts a cell into a float or returns None if it is no number
+# (None if the cells of the column are compared as text only)
+def getNumberParser(rules):
+    if rules.get("text"):
+        return None
+    clean = getNumberCleaner(rules)
+
+    def parseNumber(value):
+        if clean is not None:
+            value = clean(value)
+        if NUMBER_PATTERN.fullmatch(value) is None:
+            return None
+        return float(value)
+
+    return parseNumber
+
+
+# returns the function which decides if two numbers are equal: a == b or within the absolute / relative tolerance
+def getNumbersEqual(rules):
+    absoluteTolerance = rules.get("abs", 0.0)
+    relativeTolerance = rules.get("rel", 0.0)
+    if not absoluteTolerance and not relativeTolerance:
+        return float.__eq__
+
+    def numbersEqual(file1Number, file2Number):
+        return file1Number == file2Number or abs(file1Number - file2Number) <= \
+            max(absoluteTolerance, relativeTolerance * max(abs(file1Number), abs(file2Number)))
+
+    return numbersEqual
+
+
+# returns the compare rules of a column pair {rule: value} (the optional third entry of a pair, see parseCompareRules)
+def getPairRules(pair) -> Dict[str, object]:
+    return parseCompareRules(pair[2]) if len(pair) > 2 else {}
+
+
+# parses compare rules like "abs=0.01 rel=0.001 decimal=, thousands=. trim casefold text" into {rule: value}
+def parseCompareRules(rulesString) -> Dict[str, object]:
+    rules = {}
+    for token in rulesString.split():
+        rule, _, value = token.partition("=")
+        if rule in ["abs", "rel"]:
             try:
-                file1Value = float(file1Value)
-                file2Value = float(file2Value)
+                rules[rule] = float(value)
             except ValueError:
-                pass
+                raise ComparatorError(f"the compare rule '{token}' needs a number, e.g. {rule}=0.01")
+            if not rules[rule] >= 0:
+                raise ComparatorError(f"the tolerance of the compare rule '{token}' can not be negative")
+        elif rule in ["decimal", "thousands"]:
+            value = " " if value == "space" else value
+            if len(value) != 1:
+                raise ComparatorError(f"the compare rule '{token}' needs exactly one character, e.g. {rule}=,")
+            rules[rule] = value
+        elif rule in ["trim", "casefold", "text"] and not value:
+            rules[rule] = True
+        else:
+            raise ComparatorError(f"unknown compare rule '{token}' (use abs=, rel=, decimal=, thousands=, " +
+                                  "trim, casefold or text)")
+    checkCompareRules(rules)
+    return rules
+
+
+# raises a ComparatorError if the compare rules contradict each other
+def checkCompareRules(rules):
+    if rules.get("thousands") is not None and rules.get("thousands") == rules.get("decimal", "."):
+        raise ComparatorError(f"the decimal sign and the thousands separator can not both be '{rules['thousands']}'")
+
+
+# formats compare rules {rule: value} back into a rules string (in a fixed order, so equal rules give equal strings).
+# the string is parsed again by the comparison (see getPairRules), so tolerances are written with repr to keep every digit
+def formatCompareRules(rules) -> str:
+    tokens = []
+    for rule in ["abs", "rel", "decimal", "thousands", "trim", "casefold", "text"]:
+        if rule not in rules:
+            continue
+        if rules[rule] is True:
+            tokens.append(rule)
+        else:
+            value = "space" if rules[rule] == " " else rules[rule]
+            tokens.append(f"{rule}={value!r}" if isinstance(value, float) else f"{rule}={value}")
+    return " ".join(tokens)
+
+
+# adds the default compare rules (-cr) to all column pairs, the rules of a pair (third entry) override the defaults.
+# pairs without any rules stay [colNameFile1, colNameFile2], all others get their rules as third entry
+def applyCompareRules(colPairs, defaultRulesString) -> List[List[str]]:
+    defaultRules = parseCompareRules(defaultRulesString or "")
+    rulesPairs = []
+    for pair in colPairs:
+        rules = {**defaultRules, **getPairRules(pair)}
+        checkCompareRules(rules)
+        rulesString = formatCompareRules(rules)
+        if parseCompareRules(rulesString) != rules:
+            raise ComparatorError(f"the compare rules of the pair {pair[:2]} can not be written as rules string")
+        rulesPairs.append([pair[0], pair[1], rulesString] if rules else [pair[0], pair[1]])
+    return rulesPairs
+
+
+# same as iterCompareValues but without any file content in memory (used by the stream mode):
+# file 2 is streamed row by row and the corresponding row of file 1 is read via its byte offset
+# if changedRegions are given (see findChangedRegions) only these regions of file 2 are read, the rest is skipped
+def iterCompareValuesStreamed(colPairs, labelIntersection, path1, path2, delimiter, labelColIndicesFile2, labelOffsetDicFile1,
+                              labelDicFile2, colNameDicFile1, colNameDicFile2, ignoreValuesList,
+                              changedRegions=None) -> Iterator[Tuple[str, List[List[str]]]]:
+    comparePlan = getComparePlan(colPairs, colNameDicFile1, colNameDicFile2, ignoreValuesList)
+    getLabel = getLabelGetter(labelColIndicesFile2)
+    try:
+        with open(path1, "rb") as file1, open(path2, "rb") as file2:
+            for i, row in iterRegionRows(file2, delimiter, changedRegions):
+                if i == 0:
+                    continue
+                file2Row = splitRow(decodeRow(row), delimiter)
+                label = getLabel(file2Row)
 
-            # if the values are identical or are any value which the user said to ignore, we go to the next value
-            if file1Value == file2Value or file1ValueString in ignoreValuesList or file2ValueString in ignoreValuesList:
-                wrongValuesCoordinates.get(label).append(None)
+                # only the first occurrence of a label is compared (same as in the matrix mode)
+                if label not in labelIntersection or labelDicFile2.get(label) != i:
+                    continue
 
-            # if the values are not the same, we append the column names and the wrong values to the dic
-            else:
-                wrongValuesCoordinates.get(label).append([pair[0], file1ValueString, pair[1], file2ValueString])
-                noWrongValue = False
+                file1.seek(labelOffsetDicFile1.get(label))
+                file1Row = splitRow(decodeRow(readRow(file1, delimiter)), delimiter)
 
-        if noWrongValue:
-            del wrongValuesCoordinates[label]
+                wrongValuesOfRow = compareRow(comparePlan, file1Row, file2Row)
+                if wrongValuesOfRow is not None:
+                    yield label, wrongValuesOfRow
 
-    return wrongValuesCoordinates
+    except Exception as e:
+        print(f"<<<<<<! An error occurred: {e} !>>>>>>")
+        sys.exit(1)
         
         
+# yields (index of row, raw row) of the whole file or, if regions are given, only of the rows inside these regions
+def iterRegionRows(file, delimiter, regions=None):
+    if regions is None:
+        yield from enumerate(iterRows(file, delimiter))
+        return
+    for startOffset, firstRowIndex, rowCount in regions:
+        file.seek(startOffset)
+        for i in range(firstRowIndex, firstRowIndex + rowCount):
+            yield i, readRow(file, delimiter)
+
+
+# returns True if the pre-screen (-ps) can be used. It skips the labels whose raw rows are identical in both files,
+# which only means that their paired values are identical if every column is paired with the column at the same
+# position in the other file (e.g. two exports of the same table). colNameDics hold the col indices in the headers
+def canPreScreen(colPairs, colNameDicFile1, colNameDicFile2) -> bool:
+    return all(colNameDicFile1[pair[0]] == colNameDicFile2[pair[1]] for pair in colPairs)
+
+
+# returns all labels whose rows are not identical in both files by their row hashes (see readCSVcolumns),
+# only those need a full comparison
+def preScreenLabels(labels, labelDicFile1, labelDicFile2, rowHashesFile1, rowHashesFile2) -> Set[str]:
+    return {label for label in labels if rowHashesFile1[labelDicFile1[label]] != rowHashesFile2[labelDicFile2[label]]}
+
+
+# reads file 1 once and returns the hashes {byte offset: row hash} of the raw rows at the given byte offsets
+# (see getRowHash), the rows are neither decoded nor split
+def hashRowsAtOffsets(path, delimiter, offsets) -> Dict[int, int]:
+    rowHashes = {}
+    with open(path, "rb") as file:
+        offset = 0
+        for row in iterRows(file, delimiter):
+            if offset in offsets:
+                rowHashes[offset] = getRowHash(row)
+            offset += len(row)
+    return rowHashes
+
+
+# reads file 2 once and returns the regions [(start offset, index of first row, number of rows), ...] of the rows of the
+# given labels whose raw row differs from the row of the same label in file 1 (see hashRowsAtOffsets). The rows are
+# neither decoded nor split. Neighbouring rows are merged into one region, so the streamed comparison can skip all
+# identical parts of the file
+def findChangedRegions(path, delimiter, labels, labelDic, labelOffsetDicFile1, rowHashesFile1) \
+        -> List[Tuple[int, int, int]]:
+    labelOfRow = {labelDic[label]: label for label in labels}
+    changedRegions = []
+    regionEnd = None # offset of the end of the last region
+    with open(path, "rb") as file:
+        offset = 0
+        for i, row in enumerate(iterRows(file, delimiter)):
+            rowOffset = offset
+            offset += len(row)
+            # rows of labels which are not compared at all can not be changed
+            label = labelOfRow.get(i)
+            if label is None or getRowHash(row) == rowHashesFile1[labelOffsetDicFile1[label]]:
+                continue
+
+            if regionEnd == rowOffset:
+                startOffset, firstRowIndex, rowCount = changedRegions[-1]
+                changedRegions[-1] = (startOffset, firstRowIndex, rowCount + 1)
+            else:
+                changedRegions.append((rowOffset, i, 1))
+            regionEnd = offset
+
+    return changedRegions
+
+
+# returns the header row of the given csv file (the rest of the file is not read,
+# a compressed file is decompressed as one stream, which stops when the file is closed)
+def readCSVheader(path, delimiter) -> List[str]:
+    try:
+        with openCSV(path, parallel=False) as file:
+            return splitRow(decodeRow(readRow(file, delimiter)), delimiter)
+    except FileNotFoundError:
+        print(f"<<<<<<! the file {path} could not be found !>>>>>>")
+        sys.exit(1)
+    except Exception as e:
+        print(f"<<<<<<! An error occurred: {e} !>>>>>>")
+        sys.exit(1)
+
+
+# yields (label, index of row, row) for every row of the given csv file (the header is skipped)
+def iterLabeledRows(path, delimiter, labelColIndices):
+    getLabel = getLabelGetter(labelColIndices)
+    with openCSV(path) as file:
+        for i, row in enumerate(iterRows(file, delimiter)):
+            if i == 0:
+                continue
+            split_row = splitRow(decodeRow(row), delimiter)
+            yield getLabel(split_row), i, split_row
+
+
+# reads through the file once to report decode errors and to check if the rows are already sorted by label
+def isSortedByLabel(path, delimiter, labelColIndices) -> bool:
+    getLabel = getLabelGetter(labelColIndices)
+    sortedByLabel = True
+    previousLabel = None
+    errorRows = {}
+    with openCSV(path) as file:
+        for i, row in enumerate(iterRows(file, delimiter)):
+            decoded_row = decodeRow(row)
+            split_row = splitRow(decoded_row, delimiter)
+            if "�" in decoded_row:
+                errorRows[i] = split_row
+            if i == 0:
+                continue
+            label = getLabel(split_row)
+            if previousLabel is not None and label < previousLabel:
+                sortedByLabel = False
+            previousLabel = label
+
+    handleDecodeErrors(path, errorRows, list(errorRows))
+    return sortedByLabel
+
+
+# yields (label, index of row, row) sorted by label. If the file is not already sorted, an external merge sort is used:
+# the rows are sorted in chunks of chunkSize rows, each chunk is written to a temp file and all chunks are merged again.
+# rows with the same label keep their order, so the first occurrence of a label is always yielded first
+def iterRowsSortedByLabel(path, delimiter, labelColIndices, chunkSize=SORT_CHUNK_SIZE):
+    if isSortedByLabel(path, delimiter, labelColIndices):
+        yield from iterLabeledRows(path, delimiter, labelColIndices)
+        return
+
+    with tempfile.TemporaryDirectory() as tmpDir:
+        chunkPaths = []
+        chunk = []
+        for entry in iterLabeledRows(path, delimiter, labelColIndices):
+            chunk.append(entry)
+            if len(chunk) >= chunkSize:
+                chunkPaths.append(writeSortedChunk(chunk, tmpDir, len(chunkPaths)))
+                chunk = []
+        if chunk:
+            chunkPaths.append(writeSortedChunk(chunk, tmpDir, len(chunkPaths)))
+        del chunk
+
+        chunkFiles = [open(chunkPath, "rb") for chunkPath in chunkPaths]
+        try:
+            yield from heapq.merge(*[readSortedChunk(chunkFile) for chunkFile in chunkFiles], key=lambda entry: entry[0])
+        finally:
+            for chunkFile in chunkFiles:
+                chunkFile.close()
+
+
+# sorts the chunk by label and writes it into a temp file, returns the path of the temp file
+def writeSortedChunk(chunk, tmpDir, chunkNumber) -> str:
+    chunk.sort(key=lambda entry: entry[0])
+    chunkPath = os.path.join(tmpDir, f"chunk_{chunkNumber}")
+    with open(chunkPath, "wb") as chunkFile:
+        for entry in chunk:
+            pickle.dump(entry, chunkFile, protocol=pickle.HIGHEST_PROTOCOL)
+    return chunkPath
+
+
+# yields all entries of a chunk written by writeSortedChunk
+def readSortedChunk(chunkFile):
+    while True:
+        try:
+            yield pickle.load(chunkFile)
+        except EOFError:
+            return
+
+
+# skips all repeated labels of a stream sorted by label and saves them in duplicates {label: [indices of repeated rows]}
+def iterFirstOccurrences(sortedRows, duplicates):
+    previousLabel = None
+    for label, index, row in sortedRows:
+        if label == previousLabel:
+            duplicates.setdefault(label, []).append(index)
+            continue
+        previousLabel = label
+        yield label, index, row
+
+
+# sort-merge join: both files are walked in label order in one linear pass, so only the current row of each file
+# is in memory. Returns the wrong values (same dic as compareValues), the row indices of the labels with wrong values
+# as ({label: index of row in file 1}, {label: index of row in file 2}), the unique labels of each file as
+# {label: index of row} and the duplicates of each file as {label: [indices of repeated rows]}
+def compareValuesMerged(colPairs, path1, path2, delimiter, labelColIndicesFile1, labelColIndicesFile2,
+                        colNameDicFile1, colNameDicFile2, ignoreValuesList) \
+        -> Tuple[Dict[str, List[List[str]]], Tuple[Dict[str, int], Dict[str, int]], Dict[str, int], Dict[str, int],
+                 Dict[str, List[int]], Dict[str, List[int]]]:
+    wrongValuesCoordinates = {}
+    wrongRowsFile1 = {}
+    wrongRowsFile2 = {}
+    uniqueLabelsFile1 = {}
+    uniqueLabelsFile2 = {}
+    duplicatesFile1 = {}
+    duplicatesFile2 = {}
+    comparePlan = getComparePlan(colPairs, colNameDicFile1, colNameDicFile2, ignoreValuesList)
+    try:
+        rowsFile1 = iterFirstOccurrences(iterRowsSortedByLabel(path1, delimiter, labelColIndicesFile1), duplicatesFile1)
+        rowsFile2 = iterFirstOccurrences(iterRowsSortedByLabel(path2, delimiter, labelColIndicesFile2), duplicatesFile2)
+        entryFile1 = next(rowsFile1, None)
+        entryFile2 = next(rowsFile2, None)
+
+        while entryFile1 is not None and entryFile2 is not None:
+            if entryFile1[0] == entryFile2[0]:
+                wrongValuesOfRow = compareRow(comparePlan, entryFile1[2], entryFile2[2])
+                if wrongValuesOfRow is not None:
+                    wrongValuesCoordinates[entryFile1[0]] = wrongValuesOfRow
+                    wrongRowsFile1[entryFile1[0]] = entryFile1[1]
+                    wrongRowsFile2[entryFile2[0]] = entryFile2[1]
+                entryFile1 = next(rowsFile1, None)
+                entryFile2 = next(rowsFile2, None)
+            elif entryFile1[0] < entryFile2[0]:
+                uniqueLabelsFile1[entryFile1[0]] = entryFile1[1]
+                entryFile1 = next(rowsFile1, None)
+            else:
+                uniqueLabelsFile2[entryFile2[0]] = entryFile2[1]
+                entryFile2 = next(rowsFile2, None)
+
+        # whatever is left in one of the files has no partner in the other file
+        while entryFile1 is not None:
+            uniqueLabelsFile1[entryFile1[0]] = entryFile1[1]
+            entryFile1 = next(rowsFile1, None)
+        while entryFile2 is not None:
+            uniqueLabelsFile2[entryFile2[0]] = entryFile2[1]
+            entryFile2 = next(rowsFile2, None)
+
+    except Exception as e:
+        print(f"<<<<<<! An error occurred: {e} !>>>>>>")
+        sys.exit(1)
+
+    return wrongValuesCoordinates, (wrongRowsFile1, wrongRowsFile2), uniqueLabelsFile1, uniqueLabelsFile2, \
+        duplicatesFile1, duplicatesFile2
+
+
+# returns a 64 bit hash of the bytes of a row (a crc32 and an adler32 of the row). It is only used to find the rows
+# that changed since a snapshot, so it does not have to be a cryptographic hash and costs less than comparing the row
+def getRowHash(rowBytes) -> int:
+    return zlib.crc32(rowBytes) << 32 | zlib.adler32(rowBytes)
+
+
+# returns the state of a file which is saved in a snapshot: its size, mtime and fingerprint (see fileFingerprint)
+# and how its rows are split, so an unchanged file is recognized without reading its rows
+def getSnapshotFileState(path, delimiter) -> Dict[str, object]:
+    stat = os.stat(path)
+    return {"size": stat.st_size, "mtime": stat.st_mtime_ns, "fingerprint": fileFingerprint(path),
+            "delimiter": delimiter, "raw": parsingOptions["raw"]}
+
+
+# returns True if file <fileNumber> changed since the snapshot (or there is no snapshot), see getSnapshotFileState
+def changedSinceSnapshot(snapshot, fileNumber, fileState) -> bool:
+    return snapshot is None or snapshot["files"][fileNumber - 1] != fileState
+
+
+# returns a dic {label: row hash} of all labels of file <fileNumber> and whether the file changed since the snapshot.
+# rowHashes are the hashes of the rows (see readCSVcolumns), they are only needed if the file changed,
+# the hashes of an unchanged file are taken from the snapshot
+def getSnapshotRowHashes(snapshot, fileNumber, fileState, labelIndexDic, rowHashes) -> Tuple[Dict[str, int], bool]:
+    if not changedSinceSnapshot(snapshot, fileNumber, fileState):
+        previousRowHashes = snapshot["rowHashes"][fileNumber - 1]
+        return dict(zip(previousRowHashes["labels"], previousRowHashes["hashes"])), False
+    return {label: rowHashes[index] for label, index in labelIndexDic.items()}, True
+
+
+# loads a snapshot saved by saveSnapshot, returns None if it was made with another version or other settings
+# (then its row hashes and wrong values can not be reused)
+def loadSnapshot(path, labelColumnNames, colPairs, ignoreValuesList):
+    try:
+        with open(path, "rb") as snapshotFile:
+            snapshot = None
+            if snapshotFile.readline() == f"{SNAPSHOT_HEADER} {SNAPSHOT_VERSION}\n".encode("UTF-8"):
+                snapshot = json.load(snapshotFile)
+    except FileNotFoundError:
+        print(f"<<<<<<! the file {path} could not be found !>>>>>>")
+        sys.exit(1)
+    except Exception as e:
+        print(f"<<<<<<! the snapshot {path} could not be loaded: {e} !>>>>>>")
+        sys.exit(1)
+
+    if snapshot is None:
+        print("\n<<<<<<! the snapshot was saved by another version of CSVcomparator !>>>>>>")
+        print("> all labels are compared again")
+        return None
+    if (snapshot["labelColumnNames"] != labelColumnNames or snapshot["colPairs"] != colPairs
+            or snapshot["ignoreValues"] != sorted(set(ignoreValuesList))):
+        print("\n<<<<<<! the snapshot was made with other label columns, column pairs or ignored values !>>>>>>")
+        print("> all labels are compared again")
+        return None
+    return snapshot
+
+
+# saves the state and the row hashes of both files and the wrong values of this run as snapshot for the next run (-si)
+def saveSnapshot(path, labelColumnNames, colPairs, ignoreValuesList, fileStates, rowHashesFile1, rowHashesFile2,
+                 wrongValues):
+    # the labels and hashes are stored as two lists in the same order (dicts keep their order)
+    snapshot = {"labelColumnNames": labelColumnNames, "colPairs": colPairs,
+                "ignoreValues": sorted(set(ignoreValuesList)), "files": fileStates,
+                "rowHashes": [{"labels": list(rowHashes), "hashes": list(rowHashes.values())}
+                              for rowHashes in [rowHashesFile1, rowHashesFile2]],
+                "wrongValues": wrongValues}
+    try:
+        with open(path, "w", encoding="UTF-8") as snapshotFile:
+            snapshotFile.write(f"{SNAPSHOT_HEADER} {SNAPSHOT_VERSION}\n")
+            json.dump(snapshot, snapshotFile, ensure_ascii=False, separators=(",", ":"))
+    except Exception as e:
+        print(f"<<<<<<! ERROR: could not save the snapshot: {e} !>>>>>>")
+        sys.exit(1)
+
+    print("\nsuccessfully saved the snapshot to: " + path)
+
+
+# returns the labels which have to be compared again because their row changed in one of the files since the snapshot
+# (or they are not in the snapshot) and the wrong values of the snapshot for all unchanged labels.
+# changedRowHashes holds (file number, {label: row hash}) of the files that changed (see getSnapshotRowHashes),
+# the rows of an unchanged file are not checked
+def getChangedLabels(snapshot, labelIntersection, changedRowHashes) -> Tuple[Set[str], Dict[str, List[List[str]]]]:
+    previousWrongValues = snapshot["wrongValues"]
+
+    changedLabels = set()
+    for fileNumber, rowHashes in changedRowHashes:
+        previousRowHashes = snapshot["rowHashes"][fileNumber - 1]
+        # the set difference of the (label, hash) items finds all changed and new labels without a loop in python
+        changedItems = rowHashes.items() - zip(previousRowHashes["labels"], previousRowHashes["hashes"])
+        changedLabels.update(label for label, _ in changedItems if label in labelIntersection)
+    unchangedWrongValues = {label: wrongValuesOfRow for label, wrongValuesOfRow in previousWrongValues.items()
+                            if label in labelIntersection and label not in changedLabels}
+    return changedLabels, unchangedWrongValues
+
+
+# returns the set of (label, colNameFile1, colNameFile2) of all wrong values
+def getWrongValueKeys(wrongValues) -> Set[Tuple[str, str, str]]:
+    return {(label, wrongValue[0], wrongValue[2]) for label, wrongValuesOfRow in wrongValues.items()
+            for wrongValue in wrongValuesOfRow if wrongValue is not None}
+
+
+# prints which wrong values are new, resolved or persisting compared to the snapshot
+def printDeltaReport(previousWrongValues, wrongValues, changedLabelCount, comparableLabelCount):
+    previousKeys = getWrongValueKeys(previousWrongValues)
+    currentKeys = getWrongValueKeys(wrongValues)
+    newKeys = sorted(currentKeys - previousKeys)
+    resolvedKeys = sorted(previousKeys - currentKeys)
+
+    head = "\n" + "#" * 17 + " Changes since snapshot " + "#" * 17
+    print(head)
+    print(f"#\n### {changedLabelCount} of {comparableLabelCount} labels changed and were compared again")
+    print(f"### {len(newKeys)} new, {len(resolvedKeys)} resolved, {len(currentKeys & previousKeys)} persisting wrong value(s)")
+    if newKeys:
+        print("#\n### new wrong values:")
+        for label, colNameFile1, colNameFile2 in newKeys:
+            print("#", label, " in columns: ", colNameFile1, "<->", colNameFile2)
+    if resolvedKeys:
+        print("#\n### resolved wrong values:")
+        for label, colNameFile1, colNameFile2 in resolvedKeys:
+            print("#", label, " in columns: ", colNameFile1, "<->", colNameFile2)
+    print("#\n" + "#" * len(head))
+
+
 # prints all duplicates to the console
 def printDuplicatesIfExist(duplicatesFile1, duplicatesFile2):
     head = "\n" + "#" * 17 + " Duplicates " + "#" * 17
@@ -208,6 +1823,21 @@ def printDuplicatesIfExist(duplicatesFile1, duplicatesFile2):
         for label, rows in duplicatesFile2.items():
             print("#", label, " in row: ", ", ".join(map(str, rows)))
     print("#\n" + "#" * len(head))
+
+
+# prints the key statistics of both files (see getKeyStatistics) to the console
+def printKeyStatistics(statisticsFile1, statisticsFile2, labelColumnNames):
+    head = "\n" + "#" * 17 + " Key Statistics " + "#" * 17
+    print(head)
+    for fileNumber, statistics in enumerate([statisticsFile1, statisticsFile2], start=1):
+        print(f"#\n### file {fileNumber} (label: {labelColumnNames[fileNumber - 1]}):")
+        for name, value in statistics.items():
+            if name == "distinct values":
+                for colName, count in value.items():
+                    print(f"# distinct values of {colName}: {count}")
+            else:
+                print(f"# {name}: {value}")
+    print("#\n" + "#" * len(head))
     
         
 # print all unqiue labels to the console
@@ -251,104 +1881,471 @@ def printUniqueColNames(uniqueColNamesFile1, uniqueColNamesFile2):
         print("#\n" + "#" * len(head))
             
             
-# prints the given string to the console or to a file
-def output(string, file=None):
-    if file:
-        file.write(string + "\n")
+# returns the printout of all wrong values of one label as one string and the number of these wrong values
+def formatWrongValues(label, wrongValuesOfRow) -> Tuple[str, int]:
+    header = "\n" + "#" * 17 + f" wrong value(s) found in Label: {label} " + "#" * 17
+    lines = [header, "#"]
+
+    wrongValuesList = [wrongValueCoordinates for wrongValueCoordinates in wrongValuesOfRow
+                       if wrongValueCoordinates is not None]
+
+    for wrongValue in wrongValuesList:
+        lines.append(f"#   ######################   {label}")
+        lines.append("#")
+        lines.append("#   >File 1:")
+        lines.append(f"#   \tcolumn Name: {wrongValue[0]}")
+        lines.append(f"#   \t      value: {wrongValue[1]}")
+        lines.append("#   >File 2:")
+        lines.append(f"#   \tcolumn Name: {wrongValue[2]}")
+        lines.append(f"#   \t      value: {wrongValue[3]}")
+        lines.append("#")
+
+    lines.append("#" * len(header))
+    return "\n".join(lines), len(wrongValuesList)
+
+
+# returns the row of the CSV report for the wrong values of one label (without the label)
+def getCSVReportRow(wrongValuesOfRow) -> List[str]:
+    return ["" if value is None else value[1] + " <-> " + value[3] for value in wrongValuesOfRow]
+
+
+# yields the rows of the CSV report sorted by label: the rows of the last chunk are sorted in memory and merged
+# with the chunks which were already sorted and written to disk by writeSortedChunk
+def iterSortedCSVReportRows(chunk, chunkPaths, stack):
+    chunk.sort(key=lambda entry: entry[0])
+    chunkFiles = [stack.enter_context(open(chunkPath, "rb")) for chunkPath in chunkPaths]
+    for label, row in heapq.merge(*(readSortedChunk(chunkFile) for chunkFile in chunkFiles), chunk,
+                                  key=lambda entry: entry[0]):
+        yield [label] + row
+
+
+# returns the records of the result file for the wrong values of one label:
+# (label, col1, col2, value1, value2, row1, row2) with the indices of the rows in both files (None if unknown)
+def getResultRecords(label, wrongValuesOfRow, rowIndexDics) -> List[tuple]:
+    rowFile1 = rowIndexDics[0].get(label) if rowIndexDics else None
+    rowFile2 = rowIndexDics[1].get(label) if rowIndexDics else None
+    return [(label, value[0], value[2], value[1], value[3], rowFile1, rowFile2)
+            for value in wrongValuesOfRow if value is not None]
+
+
+# opens the result file in the given format ("parquet" or "ndjson") and registers it in the ExitStack
+def openResultFile(filePath, resultFormat, stack):
+    if resultFormat == "parquet":
+        schema = pa.schema([("label", pa.string()), ("col1", pa.string()), ("col2", pa.string()),
+                            ("value1", pa.string()), ("value2", pa.string()), ("row1", pa.int64()), ("row2", pa.int64())])
+        return stack.enter_context(pq.ParquetWriter(filePath, schema, compression="zstd"))
+    return stack.enter_context(open(filePath, "w", buffering=REPORT_BUFFER_SIZE))
+
+
+# writes a batch of records into the result file, as one row group of the parquet file or as one line per record
+def writeResultBatch(resultFile, resultFormat, batch):
+    if resultFormat == "parquet":
+        # the types come from the schema, a column with only None values (unknown rows) has no type of its own
+        columns = list(zip(*batch))
+        resultFile.write_table(pa.Table.from_arrays([pa.array(column, type=field.type)
+                                                     for column, field in zip(columns, resultFile.schema)],
+                                                    schema=resultFile.schema))
     else:
-        print(string)
-
-
-# prints all found wrong values one after another
-def printWrongValues(wrongValues, file=None):
+        resultFile.write("".join(json.dumps(dict(zip(RESULT_FIELDS, record)), ensure_ascii=False) + "\n"
+                                 for record in batch))
+
+
+# returns the default name of the reports (named after the current time)
+def getReportName() -> str:
+    return "WrongValues_" + datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+
+
+# returns the name of the result file of the given format
+def getResultFileName(fileName, resultFormat) -> str:
+    return f"{fileName}.{'parquet' if resultFormat == 'parquet' else 'ndjson'}"
+
+
+# writes the wrong values to the console and into the TXT and CSV reports and the result file
+# (if a directory is given) in one pass.
+# wrongValues is an iterable of (label, wrongValuesOfRow) as yielded by the iterCompareValues functions, every label is
+# formatted into one block and written through a large buffer, so the wrong values are never collected in memory.
+# The CSV report is sorted by label with an external merge sort (chunks of REPORT_SORT_CHUNK_SIZE rows in temp files).
+# The result file gets one record per wrong value (see RESULT_FIELDS) with the row indices from rowIndexDics
+# (labelIndexDicFile1, labelIndexDicFile2) and is written in batches of RESULT_BATCH_SIZE records.
+# (the reports are named after the current time if no fileName is given)
+# raises a ComparatorError for a missing directory or a parquet result file without pyarrow (before anything is
+# written) and the OSError of a file which cannot be written, the saved files are printed by printSavedReports
+# returns the number of labels with wrong values and the number of wrong values
+def writeReports(wrongValues, colPairs, txtDirPath=None, csvDirPath=None, fileName=None, toConsole=True,
+                 resultsDirPath=None, resultFormat="ndjson", rowIndexDics=None) -> Tuple[int, int]:
+    for dirPath in [txtDirPath, csvDirPath, resultsDirPath]:
+        if dirPath is not None and not os.path.isdir(dirPath):
+            raise ComparatorError(f"the directory {dirPath} for the reports does not exist")
+    if resultsDirPath is not None and resultFormat == "parquet" and pa is None:
+        raise ComparatorError("the parquet result file requires pyarrow, install it with: pip install pyarrow")
+    if fileName is None:
+        fileName = getReportName()
+
+    labelCounter = 0
     wrongValuesCounter = 0
+    csvChunk = []
+    chunkPaths = []
+    resultBatch = []
+    with ExitStack() as stack:
+        txtFile = None
+        if txtDirPath is not None:
+            txtFile = stack.enter_context(open(txtDirPath + f"/{fileName}.txt", "w", buffering=REPORT_BUFFER_SIZE))
+
+        csvFile = None
+        if csvDirPath is not None:
+            csvFile = stack.enter_context(open(csvDirPath + f"/{fileName}.csv", "w", newline="",
+                                               buffering=REPORT_BUFFER_SIZE))
+            tmpDir = stack.enter_context(tempfile.TemporaryDirectory(prefix="CSVcomparator_report_"))
+
+        resultFile = None
+        if resultsDirPath is not None:
+            resultFile = openResultFile(resultsDirPath + f"/{getResultFileName(fileName, resultFormat)}", resultFormat,
+                                        stack)
+
+        for label, wrongValuesOfRow in wrongValues:
+            block, counter = formatWrongValues(label, wrongValuesOfRow)
+            if toConsole:
+                if labelCounter == 0:
+                    print("\n<<<<<<! there is at least one wrong value !>>>>>>")
+                print(block)
+            if txtFile:
+                txtFile.write(block + "\n")
+            if csvFile:
+                csvChunk.append((label, getCSVReportRow(wrongValuesOfRow)))
+                if len(csvChunk) >= REPORT_SORT_CHUNK_SIZE:
+                    chunkPaths.append(writeSortedChunk(csvChunk, tmpDir, len(chunkPaths)))
+                    csvChunk = []
+            if resultFile:
+                resultBatch.extend(getResultRecords(label, wrongValuesOfRow, rowIndexDics))
+                if len(resultBatch) >= RESULT_BATCH_SIZE:
+                    writeResultBatch(resultFile, resultFormat, resultBatch)
+                    resultBatch = []
+
+            labelCounter += 1
+            wrongValuesCounter += counter
+
+        footer = f"\n>> there is a total of {wrongValuesCounter} wrong Values\n"
+        if toConsole:
+            print(footer if labelCounter else "\n### all values are identical :D ###")
+        if txtFile:
+            txtFile.write(footer + "\n")
+        if resultFile and resultBatch:
+            writeResultBatch(resultFile, resultFormat, resultBatch)
+
+        if csvFile:
+            writer = csv.writer(csvFile, delimiter=";")
+            writer.writerow([colName[0] for colName in colPairs])
+            writer.writerow([colName[1] for colName in colPairs])
+            writer.writerows(iterSortedCSVReportRows(csvChunk, chunkPaths, stack))
+
+    return labelCounter, wrongValuesCounter
+
+
+# prints the files written by writeReports
+def printSavedReports(txtDirPath, csvDirPath, resultsDirPath, resultFormat, fileName):
+    if txtDirPath is not None:
+        print("\nsuccessfully saved as TXT to: " + txtDirPath + f"/{fileName}.txt")
+    if csvDirPath is not None:
+        print("\nsuccessfully saved as CSV to: " + csvDirPath + f"/{fileName}.csv")
+    if resultsDirPath is not None:
+        print(f"\nsuccessfully saved the results as {resultFormat.upper()} to: " + resultsDirPath +
+              f"/{getResultFileName(fileName, resultFormat)}")
+
+
+# reads the manifest of the batch mode, returns a list of file pairs [[pathFile1, pathFile2], ...]
+# each row of the manifest is either a pair "pathFile1:::pathFile2" or only the path of a file which is
+# compared to the reference file (-f1). Empty rows and rows starting with "#" are skipped
+def loadBatchManifest(manifestPath, referencePath) -> List[List[str]]:
+    filePairs = []
+    try:
+        with open(manifestPath, "r") as manifest:
+            for row in manifest:
+                row = row.strip()
+                if not row or row.startswith("#"):
+                    continue
+                if ":::" in row:
+                    filePairs.append(splitPair(row))
+                elif referencePath:
+                    filePairs.append([referencePath, row])
+                else:
+                    print(f"<<<<<<! the manifest row '{row}' is no file pair and no reference file (-f1) was given !>>>>>>")
+                    sys.exit(1)
+    except FileNotFoundError:
+        print(f"<<<<<<! the file {manifestPath} could not be found !>>>>>>")
+        sys.exit(1)
 
-    for label in wrongValues.keys():
-        header = "\n" + "#" * 17 + f" wrong value(s) found in Label: {label} " + "#" * 17
-        output(header, file)
-        output("#", file)
-
-        wrongValuesList = [wrongValueCoordinates for wrongValueCoordinates in wrongValues.get(label)
-                           if wrongValueCoordinates is not None]
+    return filePairs
+
+
+# loads a file and indexes its labels, returns (content, labelSet, labelIndexDic, duplicates, rows with decode error).
+# a file in batchFileCache is taken from there, with cache set the result is put into batchFileCache
+def loadIndexedFile(path, delimiter, labelColumnNames, fileNumber, cache=False):
+    key = (path, fileNumber)
+    if key in batchFileCache:
+        return batchFileCache[key]
+
+    content, rowsWithError = readCSVcontent(path, delimiter)
+    indexedFile = (content, *getLabelSetAndIndexDic(labelColumnNames, fileNumber, content), rowsWithError)
+    if cache:
+        batchFileCache[key] = indexedFile
+    return indexedFile
+
+
+# applies the policy of an issue to one pair of the batch mode, which never asks, so "ask" goes on like "continue".
+# "fail" and "report" add the issue to the issues of the pair, returns True if the pair is stopped ("fail")
+def handleBatchIssue(issue, pairNumber, pairIssues) -> bool:
+    policy = issuePolicies[issue]
+    if policy in ["fail", "report"]:
+        pairIssues.add(issue)
+    if policy == "fail":
+        print(f"> pair {pairNumber} is stopped because of the {issue} (exit code {EXIT_CODES[issue]})")
+        return True
+    return False
+
+
+# compares one file pair of the batch mode and writes its reports, returns a summary dic of this pair.
+# the batch continues if a pair fails, so every error is only recorded in the summary. The exit code of the pair
+# is the sum of the codes of its reported issues, its wrong values and the error code if the pair failed
+def comparePairForBatch(pairNumber, filePair, args, labelColumnNames, ignoreValues) -> Dict[str, object]:
+    start = time.perf_counter()
+    path1, path2 = filePair
+    summary = {"pair": pairNumber, "file 1": path1, "file 2": path2, "status": "failed", "compared labels": 0,
+               "unique labels file 1": 0, "unique labels file 2": 0, "duplicates file 1": 0, "duplicates file 2": 0,
+               "decode errors file 1": 0, "decode errors file 2": 0, "wrong values": 0, "exit code": 0, "seconds": 0.0}
+    pairIssues = set()
+    try:
+        file1Content, labelSetFile1, labelIndexDicFile1, labelDuplicatesFile1, rowsWithErrorFile1 = \
+            loadIndexedFile(path1, args.delimiter, labelColumnNames, 1)
+        file2Content, labelSetFile2, labelIndexDicFile2, labelDuplicatesFile2, rowsWithErrorFile2 = \
+            loadIndexedFile(path2, args.delimiter, labelColumnNames, 2)
+        labelIntersection = labelSetFile1 & labelSetFile2
+        summary.update({"unique labels file 1": len(labelSetFile1 - labelSetFile2),
+                        "unique labels file 2": len(labelSetFile2 - labelSetFile1),
+                        "duplicates file 1": len(labelDuplicatesFile1), "duplicates file 2": len(labelDuplicatesFile2),
+                        "decode errors file 1": len(rowsWithErrorFile1), "decode errors file 2": len(rowsWithErrorFile2)})
+
+        # the issues are checked in the same order as in a single comparison
+        issues = [("decode errors", rowsWithErrorFile1 or rowsWithErrorFile2),
+                  ("duplicates", labelDuplicatesFile1 or labelDuplicatesFile2),
+                  ("unique labels", len(labelIntersection) != len(labelSetFile1) or
+                   len(labelIntersection) != len(labelSetFile2))]
+        for issue, found in issues:
+            if found and handleBatchIssue(issue, pairNumber, pairIssues):
+                return summary
+
+        colPairs = applyCompareRules(getColPairs(args.columnNamePairs, args.autoColumnPairs, file1Content[0],
+                                                 file2Content[0], labelColumnNames), args.compareRules)
+        colNameDicFile1 = getColNameIndexDic(colPairs, file1Content, 1)
+        colNameDicFile2 = getColNameIndexDic(colPairs, file2Content, 2)
+
+        compare = iterCompareValuesColumnar if args.numpyBackend else iterCompareValues
+        wrongValues = compare(colPairs, labelIntersection, file1Content, file2Content, labelIndexDicFile1,
+                              labelIndexDicFile2, colNameDicFile1, colNameDicFile2, ignoreValues)
+
+        fileName = f"WrongValues_{pairNumber}_{os.path.basename(path1)}_vs_{os.path.basename(path2)}"
+        _, wrongValuesCounter = writeReports(wrongValues, [labelColumnNames] + colPairs, args.saveToTXT, args.saveToCSV,
+                                             fileName, toConsole=False, resultsDirPath=args.saveResults,
+                                             resultFormat=args.resultFormat,
+                                             rowIndexDics=(labelIndexDicFile1, labelIndexDicFile2))
+        printSavedReports(args.saveToTXT, args.saveToCSV, args.saveResults, args.resultFormat, fileName)
+
+        summary.update({"status": "ok", "compared labels": len(labelIntersection), "wrong values": wrongValuesCounter})
+        if wrongValuesCounter:
+            pairIssues.add("wrong values")
+
+    except SystemExit:
+        pairIssues.add("error") # the reason was already printed by the helper that exited
+    except Exception as e:
+        print(f"<<<<<<! An error occurred in pair {pairNumber}: {e} !>>>>>>")
+        pairIssues.add("error")
+    finally:
+        summary["exit code"] = sum(EXIT_CODES[issue] for issue in pairIssues)
+        summary["seconds"] = round(time.perf_counter() - start, 3)
+    return summary
+
+
+# compares all file pairs of the manifest (concurrently if more than one worker is given)
+# and prints and saves a summary table next to the reports. A file 1 of several pairs is parsed and indexed once:
+# its pairs are compared together while it is kept in batchFileCache and it is dropped after its last pair,
+# so only one file 1 is in memory at a time. The pairs whose file 1 is not shared are compared at the end
+def runBatch(args, labelColumnNames, ignoreValues):
+    filePairs = loadBatchManifest(args.batchManifest, args.file1)
+    pairNumbersByFile1 = {}
+    for pairNumber, (path1, _) in enumerate(filePairs, 1):
+        pairNumbersByFile1.setdefault(path1, []).append(pairNumber)
+
+    if args.verbose: print(f"\n#v# {len(filePairs)} file pairs loaded from the manifest")
+
+    summaries = {}
+    unsharedPairNumbers = []
+    for path1, pairNumbers in pairNumbersByFile1.items():
+        if len(pairNumbers) == 1:
+            unsharedPairNumbers += pairNumbers
+            continue
+        try:
+            loadIndexedFile(path1, args.delimiter, labelColumnNames, 1, cache=True)
+        except (Exception, SystemExit):
+            pass # each pair of this file loads it again and reports the error
+        for summary in compareBatchPairs(pairNumbers, filePairs, args, labelColumnNames, ignoreValues):
+            summaries[summary["pair"]] = summary
+        batchFileCache.clear()
+    for summary in compareBatchPairs(unsharedPairNumbers, filePairs, args, labelColumnNames, ignoreValues):
+        summaries[summary["pair"]] = summary
+
+    summaries = [summaries[pairNumber] for pairNumber in range(1, len(filePairs) + 1)]
+    printBatchSummary(summaries)
+    saveBatchSummary(next(dirPath for dirPath in [args.saveToTXT, args.saveToCSV, args.saveResults] if dirPath is not None),
+                     summaries)
+
+    # the exit code of the batch is made of the outcomes of all pairs (see comparePairForBatch)
+    for summary in summaries:
+        reportedIssues.update(issue for issue, code in EXIT_CODES.items() if summary["exit code"] & code)
+    sys.exit(getExitCode(0))
+
+
+# compares the given pairs of the manifest (pair numbers start at 1), returns their summaries.
+# with more than one worker a new process pool is used, so forked workers inherit the current batchFileCache
+def compareBatchPairs(pairNumbers, filePairs, args, labelColumnNames, ignoreValues) -> List[Dict[str, object]]:
+    selectedPairs = [filePairs[pairNumber - 1] for pairNumber in pairNumbers]
+    if args.workers == 1 or len(pairNumbers) <= 1:
+        return [comparePairForBatch(pairNumber, filePair, args, labelColumnNames, ignoreValues)
+                for pairNumber, filePair in zip(pairNumbers, selectedPairs)]
+
+    if "fork" in multiprocessing.get_all_start_methods():
+        context = multiprocessing.get_context("fork")
+    else:
+        context = multiprocessing.get_context()
+    with ProcessPoolExecutor(max_workers=min(args.workers, len(pairNumbers)), mp_context=context,
+                             initializer=initBatchWorker, initargs=(dict(issuePolicies), dict(parsingOptions))) \
+            as executor:
+        return list(executor.map(comparePairForBatch, pairNumbers, selectedPairs, repeat(args),
+                                 repeat(labelColumnNames), repeat(ignoreValues)))
 
-        for wrongValue in wrongValuesList:
-            output(f"#   ######################   {label}", file)
-            output("#", file)
-            output("#   >File 1:", file)
-            output(f"#   \tcolumn Name: {wrongValue[0]}", file)
-            output(f"#   \t      value: {wrongValue[1]}", file)
-            output("#   >File 2:", file)
-            output(f"#   \tcolumn Name: {wrongValue[2]}", file)
-            output(f"#   \t      value: {wrongValue[3]}", file)
-            output("#", file)
-            wrongValuesCounter += 1
 
-        output("#" * len(header), file)
+# sets the issue policies and parsing options of the main process in a worker process of the batch mode
+# (a spawned worker does not inherit them)
+def initBatchWorker(policies, options):
+    issuePolicies.update(policies)
+    parsingOptions.update(options)
 
-    output(f"\n>> there is a total of {wrongValuesCounter} wrong Values\n", file)
 
+# prints the summary table of the batch mode to the console
+def printBatchSummary(summaries):
+    head = "\n" + "#" * 17 + " Batch Summary " + "#" * 17
+    print(head)
+    print("#  pair | status |  labels | unique 1 | unique 2 | decode 1 | decode 2 |  wrong  |  code  | seconds | files")
+    for summary in summaries:
+        print(f"#{center(7, summary['pair'])}|{center(8, summary['status'])}|{center(9, summary['compared labels'])}|"
+              f"{center(10, summary['unique labels file 1'])}|{center(10, summary['unique labels file 2'])}|"
+              f"{center(10, summary['decode errors file 1'])}|{center(10, summary['decode errors file 2'])}|"
+              f"{center(9, summary['wrong values'])}|{center(8, summary['exit code'])}|{center(9, summary['seconds'])}| "
+              f"{summary['file 1']} <-> {summary['file 2']}")
+    print("#\n" + "#" * len(head))
 
-# saves the wrong values to a txt file
-def saveToTXT(dirPath, wrongValues):
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
 
+# saves the summary table of the batch mode as csv file into the given directory
+def saveBatchSummary(dirPath, summaries):
+    filePath = dirPath + "/BatchSummary_" + datetime.now().strftime("%Y-%m-%d_%H-%M-%S") + ".csv"
     try:
-        if os.path.isdir(dirPath):
-            filePath = dirPath + f"/WrongValues_{timestamp}.txt"
-            with open(filePath, "w") as file:
-                printWrongValues(wrongValues, file)
+        with open(filePath, "w", newline="") as file:
+            writer = csv.DictWriter(file, fieldnames=list(summaries[0].keys()) if summaries else [], delimiter=";")
+            writer.writeheader()
+            writer.writerows(summaries)
 
     except Exception as e:
-        print(f"<<<<<<! ERROR: could not write as TXT: {e} !>>>>>>")
+        print(f"<<<<<<! ERROR: could not write the batch summary: {e} !>>>>>>")
         sys.exit(1)
 
-    print("\nsuccessfully saved as TXT to: " + dirPath + f"/WrongValues_{timestamp}.txt")
+    print("\nsuccessfully saved the batch summary to: " + filePath)
 
 
-# saves the wrong values to a csv file
-def saveToCSV(dirPath, wrongValues, colPairs):
-    timestamp = datetime.now().strftime("%Y-%m-%d_%H-%M-%S")
+# starts the measurement of a stage for the profile (-pr), returns the start values for endStage
+def startStage() -> Tuple[float, float]:
+    return time.perf_counter(), getCpuSeconds()
+
+
+# saves wall time, cpu time, peak memory and the given counts of a stage into the profile (if profiling is enabled)
+def endStage(profile, stage, stageStart, counts):
+    if profile is None:
+        return
+    wallStart, cpuStart = stageStart
+    profile["stages"][stage] = {"wall seconds": round(time.perf_counter() - wallStart, 4),
+                                "cpu seconds": round(getCpuSeconds() - cpuStart, 4),
+                                "peak RSS MB": peakRssMB(), **counts}
+
+
+# returns the cpu time of this process and all of its finished worker processes in seconds
+def getCpuSeconds() -> float:
+    own = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    return own.ru_utime + own.ru_stime + children.ru_utime + children.ru_stime
+
+
+# returns the peak memory (resident set size) of this process or of its biggest worker process in MB
+def peakRssMB() -> float:
+    peak = max(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss, resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss)
+    # ru_maxrss is in bytes on macOS and in KB on Linux
+    return round(peak / (1024 * 1024 if sys.platform == "darwin" else 1024), 1)
 
-    try:
-        if os.path.isdir(dirPath):
-            filePath = dirPath + f"/WrongValues_{timestamp}.csv"
-            with open(filePath, "w", newline="") as file:
-                writer = csv.writer(file, delimiter=";")
 
-                writer.writerow([colName[0] for colName in colPairs])
-                writer.writerow([colName[1] for colName in colPairs])
+# returns the number of rows of a file from its label index and its duplicates
+def countRows(labelIndexDic, duplicates) -> int:
+    return len(labelIndexDic) + sum(len(rows) for rows in duplicates.values())
 
-                sortedLabels = sorted(wrongValues.keys())
-                for label in sortedLabels:
 
-                    labelValues = []
+# returns the number of wrong values (not labels) in wrongValues
+def countWrongValues(wrongValues) -> int:
+    return sum(1 for wrongValuesOfRow in wrongValues.values() for wrongValue in wrongValuesOfRow if wrongValue is not None)
 
-                    for value in wrongValues.get(label):
-                        if value is None:
-                            labelValues.append("")
-                        else:
-                            labelValues.append(value[1] + " <-> " + value[3])
 
-                    writer.writerow([label] + labelValues)
+# starts a cProfile of the compare stage if a path for the stats is given (-pp), returns the profiler or None
+def startCompareProfiler(profileStatsPath):
+    if profileStatsPath is None:
+        return None
+    compareProfiler = cProfile.Profile()
+    compareProfiler.enable()
+    return compareProfiler
 
+
+# stops the cProfile of the compare stage and saves its stats (readable with pstats)
+def stopCompareProfiler(compareProfiler, profileStatsPath):
+    if compareProfiler is None:
+        return
+    compareProfiler.disable()
+    try:
+        compareProfiler.dump_stats(profileStatsPath)
+    except Exception as e:
+        print(f"<<<<<<! ERROR: could not save the profile stats: {e} !>>>>>>")
+        sys.exit(1)
+
+    print("\nsuccessfully saved the profile stats of the compare stage to: " + profileStatsPath)
+
+
+# saves the profile of all stages as JSON file
+def saveProfile(path, profile):
+    try:
+        with open(path, "w") as file:
+            json.dump(profile, file, indent=2)
     except Exception as e:
-        print(f"<<<<<<! ERROR: could not write as CSV: {e} !>>>>>>")
+        print(f"<<<<<<! ERROR: could not save the profile: {e} !>>>>>>")
         sys.exit(1)
 
-    print("\nsuccessfully saved as CSV to: " + dirPath + f"/WrongValues_{timestamp}.csv")
+    print("\nsuccessfully saved the profile to: " + path)
 
 
 def main():
     parser = argparse.ArgumentParser(description="CSV comparator script - labels per row and have to be identical!")
     
     # required arguments:
-    parser.add_argument("-f1", "--file1", type=str, required=True,
-                        help="Path of the file which gets compared to the second one")
-    parser.add_argument("-f2", "--file2", type=str, required=True,
-                        help="Path of the file which is compared to the first one")
+    parser.add_argument("-f1", "--file1", type=str,
+                        help="Path of the file which gets compared to the second one " +
+                             "(in batch mode the reference file which is compared to all files of the manifest)")
+    parser.add_argument("-f2", "--file2", type=str,
+                        help="Path of the file which is compared to the first one (not used in batch mode)")
     parser.add_argument("-lp", "--labelColumnNamePair", type=str, required=True,
                         help="name of the columns in which the labels are stored " +
-                             "\nthey are inputted in the way: colNameForLabelsFile1:::colNameForLabelFile2")
+                             "\nthey are inputted in the way: colNameForLabelsFile1:::colNameForLabelFile2 " +
+                             "(a label of several columns is inputted as colA+colB:::colA+colB)")
    
     # modes:
     parser.add_argument("-lc", "--labelComparison", action="store_true",
@@ -371,6 +2368,70 @@ def main():
                         help="path to directory in which the console printout gets saved into a txt file")
     parser.add_argument("-sc", "--saveToCSV", type=str,
                         help="path to a directory in which wrongValues gets saved as CSV file")
+    parser.add_argument("-sr", "--saveResults", type=str,
+                        help="path to a directory in which the wrong values are saved as a machine readable result file " +
+                             "with one record per wrong value (label, col1, col2, value1, value2, row1, row2)")
+    parser.add_argument("-rf", "--resultFormat", type=str, choices=["auto", "parquet", "ndjson"], default="auto",
+                        help="format of the result file of -sr: 'parquet' (requires pyarrow), 'ndjson' (one JSON object " +
+                             "per line) or 'auto' (default, parquet if pyarrow is installed, else ndjson)")
+    parser.add_argument("-cr", "--compareRules", type=str,
+                        help="compare rules for all column pairs, e.g. \"abs=0.01 rel=0.001 decimal=, thousands=. trim " +
+                             "casefold text\" (a pair in the -cp file can have its own rules: colNameFile1:::colNameFile2:::rules)")
+    parser.add_argument("-sm", "--streamMode", action="store_true",
+                        help="only the labels of both files are kept in memory, the rows are streamed from disk " +
+                             "while comparing (for files that do not fit into memory)")
+    parser.add_argument("-je", "--joinEngine", type=str, choices=["hash", "merge"], default="hash",
+                        help="how the rows of both files are matched: 'hash' (default) looks up the labels in dictionaries, " +
+                             "'merge' walks both files sorted by label in one pass (files which are not already sorted " +
+                             "by label get sorted with an external merge sort using temp files)")
+    parser.add_argument("-nb", "--numpyBackend", action="store_true",
+                        help="compares whole columns at once with numpy instead of cell by cell (requires numpy)")
+    parser.add_argument("-w", "--workers", type=int, default=1,
+                        help="number of worker processes which compare the labels in parallel (default is 1)")
+    parser.add_argument("-bm", "--batchManifest", type=str,
+                        help="path to a .txt manifest with one comparison per row, either a file pair " +
+                             "pathFile1:::pathFile2 or only a path which is compared to the reference file -f1")
+    parser.add_argument("-cd", "--cacheDir", type=str, default=os.environ.get("CSVCOMPARATOR_CACHE_DIR"),
+                        help="path to a directory in which the label indices of the files are cached and reused " +
+                             "as long as a file is unchanged (default is $CSVCOMPARATOR_CACHE_DIR if set)")
+    parser.add_argument("-cs", "--cacheSize", type=int, default=DEFAULT_CACHE_SIZE_MB,
+                        help=f"maximum size of the cache directory in MB (default is {DEFAULT_CACHE_SIZE_MB}), " +
+                             "the least recently used entries are deleted beyond this size")
+    parser.add_argument("-nc", "--noCache", action="store_true",
+                        help="neither read nor write the label index cache (overrides -cd and $CSVCOMPARATOR_CACHE_DIR)")
+    parser.add_argument("-ss", "--saveSnapshot", type=str,
+                        help="path of a file in which the row hashes of both files and the wrong values are saved " +
+                             "after the comparison, so the next run can use it with -si")
+    parser.add_argument("-si", "--since", type=str,
+                        help="path to a snapshot saved with -ss: only labels whose row changed in one of the files " +
+                             "are compared again and new, resolved and persisting wrong values are reported")
+    parser.add_argument("-ps", "--preScreen", action="store_true",
+                        help="hashes the raw row of each label in both files first and only compares the labels whose " +
+                             "rows differ (in stream mode the identical parts of file 2 are skipped), needs every " +
+                             "paired column at the same position in both files")
+    parser.add_argument("-pr", "--profile", type=str,
+                        help="path of a JSON file in which wall time, cpu time, peak memory and counts of every stage " +
+                             "(load, label index, column pairs, compare, report) are saved")
+    parser.add_argument("-pp", "--profileStats", type=str,
+                        help="path of a file in which a cProfile/pstats dump of the compare stage is saved " +
+                             "(worker processes of -w are not included)")
+    parser.add_argument("-ode", "--onDecodeError", type=str, choices=["ask", "continue", "fail", "report"], default="ask",
+                        help="what happens if a file has decode errors: 'ask' (default) asks whether to continue, " +
+                             "'continue' goes on with the '�' replacement, 'fail' stops with exit code " +
+                             f"{EXIT_CODES['decode errors']} and 'report' goes on but adds " +
+                             f"{EXIT_CODES['decode errors']} to the exit code")
+    parser.add_argument("-odu", "--onDuplicates", type=str, choices=["ask", "continue", "fail", "report"], default="ask",
+                        help="what happens if a file has repetitive labels (same choices as -ode, " +
+                             f"exit code {EXIT_CODES['duplicates']})")
+    parser.add_argument("-oul", "--onUniqueLabels", type=str, choices=["ask", "continue", "fail", "report"], default="ask",
+                        help="what happens if some labels are unique to one file (same choices as -ode, " +
+                             f"exit code {EXIT_CODES['unique labels']})")
+    parser.add_argument("-rp", "--rawParsing", action="store_true",
+                        help="splits every line at each delimiter and keeps quotes as part of the values " +
+                             "(by default fields in double quotes may contain the delimiter and line breaks)")
+    parser.add_argument("-ks", "--keyStatistics", action="store_true",
+                        help="prints rows, distinct labels, duplicates and (for a composite label) the distinct values " +
+                             "of each label column of both files, taken from the label index without another pass")
     parser.add_argument("-v", "--verbose", action="store_true")
 
     args = parser.parse_args()
@@ -384,111 +2445,336 @@ def main():
                      "\n > use the -acp/--autoColumnPairs flag to compare all columns with the same name" + 
                      "\n > or use the -lc/--labelComparison flag to compare the labels of the two files")
         
+    if args.batchManifest:
+        if not columnNamePairMode and not autoPairMode:
+            parser.error("\n > the batch mode needs column pairs: use -cp/--columnNamePairs or -acp/--autoColumnPairs")
+        if args.saveToTXT is None and args.saveToCSV is None and args.saveResults is None:
+            parser.error("\n > the batch mode needs a directory for the reports: use -st/--saveToTXT, -sc/--saveToCSV " +
+                         "or -sr/--saveResults")
+        if args.streamMode or args.joinEngine == "merge":
+            parser.error("\n > the batch mode can only be used with the 'hash' join engine and without -sm/--streamMode")
+    elif args.file1 is None or args.file2 is None:
+        parser.error("\n > the arguments -f1/--file1 and -f2/--file2 are required (unless -bm/--batchManifest is used)")
+
     if args.delimiter not in [",", ";", "|", "\t"]:
         parser.error("\n > The delimiter has to be one of the following: ',' ';' '|' or '\\t'")
 
-    file1Content = loadCSVcontent(args.file1, args.delimiter)
-    file2Content = loadCSVcontent(args.file2, args.delimiter)
+    if args.streamMode and args.joinEngine == "merge":
+        parser.error("\n > -sm/--streamMode can only be used with the 'hash' join engine (the 'merge' engine always streams)")
+
+    if args.numpyBackend and (args.streamMode or args.joinEngine == "merge"):
+        parser.error("\n > -nb/--numpyBackend can only be used with the 'hash' join engine and without -sm/--streamMode")
+
+    if args.workers < 1:
+        parser.error("\n > -w/--workers has to be at least 1")
+
+    try:
+        parseCompareRules(args.compareRules or "")
+    except ComparatorError as e:
+        parser.error(f"\n > -cr/--compareRules: {e}")
+
+    if args.workers > 1 and (args.streamMode or args.joinEngine == "merge"):
+        parser.error("\n > -w/--workers can only be used with the 'hash' join engine and without -sm/--streamMode")
+
+    if args.preScreen and (args.joinEngine == "merge" or args.batchManifest):
+        parser.error("\n > -ps/--preScreen can only be used with the 'hash' join engine and without -bm/--batchManifest")
+
+    if (args.saveSnapshot or args.since) and (args.streamMode or args.joinEngine == "merge" or args.batchManifest):
+        parser.error("\n > -ss/--saveSnapshot and -si/--since can only be used with the 'hash' join engine " +
+                     "and without -sm/--streamMode or -bm/--batchManifest")
+
+    if args.streamMode and any(os.path.isfile(path) and getCompression(path) for path in [args.file1, args.file2]):
+        parser.error("\n > -sm/--streamMode reads rows by their byte offset and cannot be used with compressed files " +
+                     "(use -je merge to compare them without loading them)")
+
+    if args.keyStatistics and (args.joinEngine == "merge" or args.batchManifest):
+        parser.error("\n > -ks/--keyStatistics can only be used with the 'hash' join engine and without -bm/--batchManifest")
+
+    if args.numpyBackend and np is None:
+        parser.error("\n > -nb/--numpyBackend requires numpy, install it with: pip install numpy")
+
+    if args.resultFormat == "parquet" and pa is None:
+        parser.error("\n > -rf/--resultFormat parquet requires pyarrow, install it with: pip install pyarrow " +
+                     "(or use -rf ndjson)")
+    if args.resultFormat == "auto":
+        args.resultFormat = "parquet" if pa is not None else "ndjson"
+
+    for option, dirPath in [("-st/--saveToTXT", args.saveToTXT), ("-sc/--saveToCSV", args.saveToCSV),
+                            ("-sr/--saveResults", args.saveResults)]:
+        if dirPath is not None and not os.path.isdir(dirPath):
+            parser.error(f"\n > {option}: the directory {dirPath} does not exist")
 
     if args.ignoreValues is None:
         ignoreValues = []
     else:
         ignoreValues = args.ignoreValues
 
-    if args.verbose: print("\n#v# CSV loading successful")
+    issuePolicies.update({"decode errors": args.onDecodeError, "duplicates": args.onDuplicates,
+                          "unique labels": args.onUniqueLabels})
+    parsingOptions.update({"raw": args.rawParsing})
+
+    cacheDir = None if args.noCache else args.cacheDir
+    maxCacheBytes = args.cacheSize * 1024 * 1024
 
     # saves the names of the columns in which the labels are stored in a
     # list (index 0 = colName of labels in File 1, 
     #       index 1 = colName of labels in File 2)
     labelColumnNames = splitPair(args.labelColumnNamePair)
 
-    # check if labelListFile1 is subset of labelListFile2
-    labelSetFile1, labelIndexDicFile1, labelDuplicatesFile1 = getLabelSetAndIndexDic(labelColumnNames, 1, file1Content)
-    labelSetFile2, labelIndexDicFile2,  labelDuplicatesFile2 = getLabelSetAndIndexDic(labelColumnNames, 2, file2Content)
+    if args.batchManifest:
+        runBatch(args, labelColumnNames, ignoreValues)
+        return
+
+    profile = {"version": PROFILE_VERSION, "timestamp": datetime.now().isoformat(timespec="seconds"),
+               "arguments": sys.argv[1:], "stages": {}} if args.profile else None
+    runStart = startStage()
+
+    stageStart = startStage()
+    if args.streamMode:
+        # only the header and the label indices are kept in memory, the rows are read again while comparing
+        headerFile1, labelIndexDicFile1, labelOffsetDicFile1, labelDuplicatesFile1 = \
+            indexCSVlabels(args.file1, args.delimiter, labelColumnNames, 1, withOffsets=True, cacheDir=cacheDir,
+                           maxCacheBytes=maxCacheBytes)
+        headerFile2, labelIndexDicFile2, _, labelDuplicatesFile2 = \
+            indexCSVlabels(args.file2, args.delimiter, labelColumnNames, 2, cacheDir=cacheDir, maxCacheBytes=maxCacheBytes)
+        labelSetFile1 = labelIndexDicFile1.keys()
+        labelSetFile2 = labelIndexDicFile2.keys()
+
+        endStage(profile, "label index", stageStart, {"rows file 1": countRows(labelIndexDicFile1, labelDuplicatesFile1),
+                                                      "rows file 2": countRows(labelIndexDicFile2, labelDuplicatesFile2)})
+
+        if args.verbose: print("\n#v# CSV label indexing successful")
+
+    else:
+        # only the headers are read here, the merge engine reads the rows while merging and the hash engine
+        # loads the files when it is known which columns are needed
+        headerFile1 = readCSVheader(args.file1, args.delimiter)
+        headerFile2 = readCSVheader(args.file2, args.delimiter)
+
+    stageStart = startStage()
+    colPairs = applyCompareRules(getColPairs(columnNamePairMode, autoPairMode, headerFile1, headerFile2, labelColumnNames),
+                                 args.compareRules)
     
+    # find all unique column names in the files
+    if args.printUniqueColNames:
+        colNameSetFile1 = set(headerFile1)
+        colNameSetFile2 = set(headerFile2)
+        labelSet = set(getLabelColumns(labelColumnNames[0], headerFile1) + getLabelColumns(labelColumnNames[1], headerFile2))
+        uniqueColNamesFile1 = colNameSetFile1 - colNameSetFile2 - labelSet
+        uniqueColNamesFile2 = colNameSetFile2 - colNameSetFile1 - labelSet
+
+    if args.verbose: print("\n#v# column pairs successfully loaded!")
+
+    colNameDicFile1 = getColNameIndexDic(colPairs, [headerFile1], 1)
+    colNameDicFile2 = getColNameIndexDic(colPairs, [headerFile2], 2)
+    endStage(profile, "column pairs", stageStart, {"column pairs": len(colPairs)})
+
+    preScreen = args.preScreen and canPreScreen(colPairs, colNameDicFile1, colNameDicFile2)
+    if args.preScreen and not preScreen:
+        print("\n<<<<<<! the pre-screen is skipped, it needs the paired columns at the same positions in both files !>>>>>>")
+
+    if args.verbose: print("\n#v# Column Name Dictionary's successfully loaded!")
+
+    snapshot = None
+    if args.joinEngine == "hash" and not args.streamMode:
+        # only the label column and the paired columns are decoded
+        stageStart = startStage()
+        neededColIndicesFile1 = getNeededColIndices(headerFile1, labelColumnNames[0], colNameDicFile1)
+        neededColIndicesFile2 = getNeededColIndices(headerFile2, labelColumnNames[1], colNameDicFile2)
+        # the rows are hashed while they are loaded for the pre-screen and (with a snapshot) if the file changed since
+        # the snapshot (see getSnapshotRowHashes)
+        hashRowsFile1 = hashRowsFile2 = preScreen
+        if args.since:
+            snapshot = loadSnapshot(args.since, labelColumnNames, colPairs, ignoreValues)
+        if args.since or args.saveSnapshot:
+            fileStates = [getSnapshotFileState(args.file1, args.delimiter), getSnapshotFileState(args.file2, args.delimiter)]
+            hashRowsFile1 = hashRowsFile1 or changedSinceSnapshot(snapshot, 1, fileStates[0])
+            hashRowsFile2 = hashRowsFile2 or changedSinceSnapshot(snapshot, 2, fileStates[1])
+        rowHashesFile1 = [] if hashRowsFile1 else None
+        rowHashesFile2 = [] if hashRowsFile2 else None
+        file1Content, errorRowsFile1 = loadCSVcontent(args.file1, args.delimiter, neededColIndicesFile1, rowHashesFile1)
+        file2Content, errorRowsFile2 = loadCSVcontent(args.file2, args.delimiter, neededColIndicesFile2, rowHashesFile2)
+        # the rows only hold the needed columns, so the col indices are translated to positions in the rows once
+        colPositionsFile1 = getColPositions(neededColIndicesFile1)
+        colPositionsFile2 = getColPositions(neededColIndicesFile2)
+        colNameDicFile1 = getColNameIndexDic(colPairs, [headerFile1], 1, colPositionsFile1)
+        colNameDicFile2 = getColNameIndexDic(colPairs, [headerFile2], 2, colPositionsFile2)
+
+        endStage(profile, "load", stageStart, {"rows file 1": len(file1Content) - 1, "rows file 2": len(file2Content) - 1})
+
+        if args.verbose: print("\n#v# CSV loading successful")
+
+        # check if labelListFile1 is subset of labelListFile2
+        stageStart = startStage()
+        labelSetFile1, labelIndexDicFile1, labelDuplicatesFile1 = \
+            getLabelSetAndIndexDicCached(labelColumnNames, 1, file1Content, errorRowsFile1, args.file1, args.delimiter,
+                                         cacheDir, maxCacheBytes, colPositionsFile1)
+        labelSetFile2, labelIndexDicFile2,  labelDuplicatesFile2 = \
+            getLabelSetAndIndexDicCached(labelColumnNames, 2, file2Content, errorRowsFile2, args.file2, args.delimiter,
+                                         cacheDir, maxCacheBytes, colPositionsFile2)
+        endStage(profile, "label index", stageStart, {"labels file 1": len(labelIndexDicFile1),
+                                                      "labels file 2": len(labelIndexDicFile2),
+                                                      "duplicates file 1": len(labelDuplicatesFile1),
+                                                      "duplicates file 2": len(labelDuplicatesFile2)})
+
+    if args.joinEngine == "merge":
+        # unique labels and duplicates are found in the same pass as the wrong values
+        stageStart = startStage()
+        compareProfiler = startCompareProfiler(args.profileStats)
+        labelColIndicesFile1 = getLabelColIndices(headerFile1, labelColumnNames[0], 1)
+        labelColIndicesFile2 = getLabelColIndices(headerFile2, labelColumnNames[1], 2)
+        wrongValues, rowIndexDics, labelIndexDicFile1, labelIndexDicFile2, labelDuplicatesFile1, labelDuplicatesFile2 = \
+            compareValuesMerged(colPairs, args.file1, args.file2, args.delimiter, labelColIndicesFile1, labelColIndicesFile2,
+                                colNameDicFile1, colNameDicFile2, ignoreValues)
+        # the merge pass only returns the unique labels, so the set difference is already done
+        labelSetFile1 = labelIndexDicFile1.keys()
+        labelSetFile2 = labelIndexDicFile2.keys()
+        stopCompareProfiler(compareProfiler, args.profileStats)
+        endStage(profile, "compare", stageStart, {"wrong values": countWrongValues(wrongValues)})
+
+    if args.keyStatistics:
+        printKeyStatistics(getKeyStatistics(labelIndexDicFile1, labelDuplicatesFile1,
+                                            getLabelColumns(labelColumnNames[0], headerFile1)),
+                           getKeyStatistics(labelIndexDicFile2, labelDuplicatesFile2,
+                                            getLabelColumns(labelColumnNames[1], headerFile2)),
+                           labelColumnNames)
+
     if labelDuplicatesFile1 or labelDuplicatesFile2:
         printDuplicatesIfExist(labelDuplicatesFile1, labelDuplicatesFile2)
         print("\n<<<<<<! There are repetitive labels !>>>>>>")
         print("> see above / scroll up to see details!")
         print("> If you proceed with the comparison, the first occurrence of the label will be used!")
-        continueEvenWithDuplicates = input("\n> do you want to continue either way? (y/n)\n")
-        if continueEvenWithDuplicates != "y":
-            sys.exit(0)
+        handleIssue("duplicates", "\n> do you want to continue either way? (y/n)\n")
     
-    unique_labels_file1 = labelSetFile1 - labelSetFile2
-    unique_labels_file2 = labelSetFile2 - labelSetFile1
+    if args.joinEngine == "merge":
+        unique_labels_file1 = labelSetFile1
+        unique_labels_file2 = labelSetFile2
+    else:
+        unique_labels_file1 = labelSetFile1 - labelSetFile2
+        unique_labels_file2 = labelSetFile2 - labelSetFile1
     
     if (labelComparisonMode):
             printUniqueLabels(unique_labels_file1, labelIndexDicFile1, unique_labels_file2, labelIndexDicFile2)
             if not columnNamePairMode and not autoPairMode: # end script if only label comparison mode is used
-                sys.exit(0)
+                # there is nothing left to continue with, so only fail and report change the outcome
+                if (unique_labels_file1 or unique_labels_file2) and issuePolicies["unique labels"] in ["fail", "report"]:
+                    handleIssue("unique labels", "")
+                sys.exit(getExitCode(0))
         
     if unique_labels_file1 or unique_labels_file2:
         if not labelComparisonMode:
             print("\n<<<<<<! Some labels are unique either for File1 or for File2 !>>>>>>")
             print("> You may want to check the differences with the -lc flag")
-        userInput = input("\n> do you want to continue either way? (y/n)\n")
-        if userInput != "y":
-            sys.exit(0)
-
-    labelIntersection = labelSetFile1 & labelSetFile2
-    if args.verbose: print("\n#v# Label Sets & Label Dictionary's loaded! - Label Intersection created")
-    
-    # save all pairs in a colPairs Matrix [[colNameFile1, colNameFile2] [colNameFile1, colNameFile2], ...]
-    colPairs = []
-    if columnNamePairMode:
-        try:
-            with open(columnNamePairMode, "r") as colNamePairFile:
-                # only split and append if the line is not empty (last if checks if line is empty)
-                colPairs = [splitPair(pair.strip()) for pair in colNamePairFile if pair.strip()]
-        except Exception as e:
-            print(f"<<<<<<! An error occurred: {e} !>>>>>>")
-            sys.exit(1)
-    
-    # find all unique column names in the files
-    if args.printUniqueColNames:
-        colNameSetFile1 = set(file1Content[0])
-        colNameSetFile2 = set(file2Content[0])
-        labelSet = set(labelColumnNames)
-        uniqueColNamesFile1 = colNameSetFile1 - colNameSetFile2 - labelSet
-        uniqueColNamesFile2 = colNameSetFile2 - colNameSetFile1 - labelSet
-      
-    # find all columns with the same name that are not already in the ColPairs list and do not occure in the LabelColumnNames
-    # first check is to prevent the same column to be compared twice
-    # second check is to prevent the label columns to be compared        
-    if autoPairMode:
-        for colName in file1Content[0]:
-            if colName in file2Content[0] and colName not in labelColumnNames and [colName, colName] not in colPairs:
-                colPairs.append([colName, colName])
-        
-
-    if args.verbose: print("\n#v# column pairs successfully loaded!")
-
-    colNameDicFile1 = getColNameIndexDic(colPairs, file1Content, 1)
-    colNameDicFile2 = getColNameIndexDic(colPairs, file2Content, 2)
-
-    if args.verbose: print("\n#v# Column Name Dictionary's successfully loaded!")
-
-    wrongValues = compareValues(colPairs, labelIntersection, file1Content, file2Content, labelIndexDicFile1, labelIndexDicFile2,
-                                colNameDicFile1, colNameDicFile2, ignoreValues)
+        handleIssue("unique labels", "\n> do you want to continue either way? (y/n)\n")
+
+    if args.joinEngine == "hash":
+        labelIntersection = labelSetFile1 & labelSetFile2
+        if args.verbose: print("\n#v# Label Sets & Label Dictionary's loaded! - Label Intersection created")
+
+        stageStart = startStage()
+        compareProfiler = startCompareProfiler(args.profileStats)
+
+        # with a snapshot only the labels whose rows changed are compared, the others keep their wrong values
+        labelsToCompare = labelIntersection
+        if args.since or args.saveSnapshot:
+            labelRowHashesFile1, changedFile1 = getSnapshotRowHashes(snapshot, 1, fileStates[0], labelIndexDicFile1,
+                                                                     rowHashesFile1)
+            labelRowHashesFile2, changedFile2 = getSnapshotRowHashes(snapshot, 2, fileStates[1], labelIndexDicFile2,
+                                                                     rowHashesFile2)
+        if snapshot is not None:
+            changedRowHashes = [(fileNumber, labelRowHashes) for fileNumber, labelRowHashes, changed in
+                                [(1, labelRowHashesFile1, changedFile1), (2, labelRowHashesFile2, changedFile2)] if changed]
+            labelsToCompare, unchangedWrongValues = getChangedLabels(snapshot, labelIntersection, changedRowHashes)
+            if args.verbose: print(f"\n#v# {len(labelsToCompare)} changed labels found in the snapshot comparison")
+
+        changedRegions = None
+        if preScreen and args.streamMode:
+            rowHashesFile1 = hashRowsAtOffsets(args.file1, args.delimiter,
+                                               {labelOffsetDicFile1[label] for label in labelsToCompare})
+            changedRegions = findChangedRegions(args.file2, args.delimiter, labelsToCompare, labelIndexDicFile2,
+                                                labelOffsetDicFile1, rowHashesFile1)
+            del rowHashesFile1
+            if args.verbose: print(f"\n#v# pre-screen found {len(changedRegions)} changed region(s) in file 2")
+        elif preScreen:
+            labelsToCompare = preScreenLabels(labelsToCompare, labelIndexDicFile1, labelIndexDicFile2, rowHashesFile1,
+                                              rowHashesFile2)
+            if args.verbose: print(f"\n#v# pre-screen found {len(labelsToCompare)} label(s) with different values")
+
+        if args.streamMode:
+            wrongValues = iterCompareValuesStreamed(colPairs, labelsToCompare, args.file1, args.file2, args.delimiter,
+                                                    getLabelColIndices(headerFile2, labelColumnNames[1], 2), labelOffsetDicFile1,
+                                                    labelIndexDicFile2, colNameDicFile1, colNameDicFile2, ignoreValues,
+                                                    changedRegions=changedRegions)
+        elif args.workers > 1:
+            wrongValues = iterCompareValuesParallel(args.workers, colPairs, labelsToCompare, args.file1, args.file2,
+                                                    args.delimiter, file1Content, file2Content, labelIndexDicFile1,
+                                                    labelIndexDicFile2, colNameDicFile1, colNameDicFile2, ignoreValues,
+                                                    numpyBackend=args.numpyBackend,
+                                                    colIndices=(neededColIndicesFile1, neededColIndicesFile2))
+        elif args.numpyBackend:
+            wrongValues = iterCompareValuesColumnar(colPairs, labelsToCompare, file1Content, file2Content, labelIndexDicFile1,
+                                                    labelIndexDicFile2, colNameDicFile1, colNameDicFile2, ignoreValues)
+        else:
+            wrongValues = iterCompareValues(colPairs, labelsToCompare, file1Content, file2Content, labelIndexDicFile1,
+                                            labelIndexDicFile2, colNameDicFile1, colNameDicFile2, ignoreValues)
+        compareCounts = {"compared labels": len(labelIntersection), "fully compared labels": len(labelsToCompare),
+                         "compared cells": len(labelsToCompare) * len(colPairs)}
+
+    # without a snapshot the wrong values are not needed after the reports, so they are streamed from the comparison
+    # straight into the reports (the compare and the report stage can then only be profiled together)
+    streamReports = args.joinEngine == "hash" and not args.since and not args.saveSnapshot
+
+    if args.joinEngine == "hash" and not streamReports:
+        wrongValues = dict(wrongValues)
+        stopCompareProfiler(compareProfiler, args.profileStats)
+        endStage(profile, "compare", stageStart, {**compareCounts, "wrong values": countWrongValues(wrongValues)})
+
+        if snapshot is not None:
+            wrongValues.update(unchangedWrongValues)
+            printDeltaReport(snapshot["wrongValues"], wrongValues, len(labelsToCompare), len(labelIntersection))
+        if args.saveSnapshot:
+            saveSnapshot(args.saveSnapshot, labelColumnNames, colPairs, ignoreValues, fileStates, labelRowHashesFile1,
+                         labelRowHashesFile2, wrongValues)
 
     if args.verbose: print("\n#v# comparison of values successful!")
+
+    if not streamReports:
+        stageStart = startStage()
+        wrongValues = wrongValues.items()
     
     if args.printUniqueColNames:
         printUniqueColNames(uniqueColNamesFile1, uniqueColNamesFile2)
 
-    if not wrongValues:
-        print("\n### all values are identical :D ###")
+    if args.joinEngine == "hash":
+        rowIndexDics = (labelIndexDicFile1, labelIndexDicFile2)
+
+    reportName = getReportName()
+    try:
+        labelCounter, wrongValuesCounter = writeReports(wrongValues, [labelColumnNames] + colPairs, args.saveToTXT,
+                                                        args.saveToCSV, reportName, resultsDirPath=args.saveResults,
+                                                        resultFormat=args.resultFormat, rowIndexDics=rowIndexDics)
+    except (ComparatorError, OSError) as e:
+        print(f"<<<<<<! ERROR: could not write the reports: {e} !>>>>>>")
+        sys.exit(1)
+    printSavedReports(args.saveToTXT, args.saveToCSV, args.saveResults, args.resultFormat, reportName)
+
+    if streamReports:
+        stopCompareProfiler(compareProfiler, args.profileStats)
+        endStage(profile, "compare and report", stageStart,
+                 {**compareCounts, "wrong values": wrongValuesCounter, "labels with wrong values": labelCounter})
     else:
-        print("\n<<<<<<! there is at least one wrong value !>>>>>>")
-        printWrongValues(wrongValues)
+        endStage(profile, "report", stageStart, {"labels with wrong values": labelCounter})
 
-    if args.saveToTXT is not None:
-        saveToTXT(args.saveToTXT, wrongValues)
+    if profile is not None:
+        endStage(profile, "total", runStart, {})
+        saveProfile(args.profile, profile)
 
-    if args.saveToCSV is not None:
-        saveToCSV(args.saveToCSV, wrongValues, [labelColumnNames] + colPairs)
+    sys.exit(getExitCode(wrongValuesCounter))
 
 
 if __name__ == "__main__":
-    main()
+    try:
+        main()
+    except ComparatorError as e:
+        print(f"<<<<<<! {e} !>>>>>>")
+        sys.exit(1)
@@ -0,0 +1,158 @@
+# This module exposes the CSVcomparator as a library, so other Python programs can compare files in-process
+# without argparse, questions or sys.exit. A file is loaded and indexed once into an IndexedTable,
+# which can then be compared to any number of other tables:
+
+#   from api import IndexedTable, compare
+#   reference = IndexedTable.fromCSV("reference.csv", "label")
+#   result = compare(reference, IndexedTable.fromCSV("export.csv", "l"), [["A", "a"]], ignoreValues=["Null"])
+#   for label, col1, col2, value1, value2, row1, row2 in result.records():
+#       ...
+
+# All failures raise a ComparatorError (or the OSError of the file) instead of exiting.
+
+# COPYRIGHT © 2024 Niklas Max G.
+# This work is licensed under the Creative Commons Attribution-NonCommercial 4.0 International License.
+# More details at: https://github.com/AbUndMax/CSVcomparator-Batch-Program/blob/main/LICENSE.md
+# For a quick overview, visit https://creativecommons.org/licenses/by-nc/4.0/
+
+from typing import Dict, Iterator
+
+from CSVcomparator import (ComparatorError, openCSV, readCSVcontent, readCSVcolumns, readRow, decodeRow, splitRow,
+                           getLabelSetAndIndexDic, getLabelColumns, getKeyStatistics, getColNameIndexDic, getColPairs,
+                           getColPositions, applyCompareRules, getResultRecords, countWrongValues, compareValues,
+                           compareValuesColumnar, writeReports, np)
+
+
+# a parsed csv file together with its label index and header map, it is built once and can be compared many times
+class IndexedTable:
+
+    # content is a matrix whose first row is the header (the other rows are lists of the values).
+    # labelColumn is one column name or a composite label "colA+colB" (like -lp)
+    def __init__(self, content, labelColumn, path=None, decodeErrorRows=None):
+        if not content:
+            raise ComparatorError(f"the table {path or 'in memory'} has no header row")
+        for colName in getLabelColumns(labelColumn, content[0]):
+            if colName not in content[0]:
+                raise ComparatorError(f"the label column '{colName}' is not present in the table {path or 'in memory'}")
+        self.path = path
+        self.content = content
+        self.header = content[0]
+        self.labelColumn = labelColumn
+        self.decodeErrorRows = decodeErrorRows or []
+        self.colNameDic = {colName: index for index, colName in reversed(list(enumerate(self.header)))}
+        _, self.labelIndexDic, self.duplicates = getLabelSetAndIndexDic([labelColumn], 1, content)
+
+    # loads and indexes a csv file. With columns only these columns (and the label column) are kept in memory.
+    # decode errors raise a ComparatorError unless allowDecodeErrors is set (then the cells keep the '�' replacement)
+    @classmethod
+    def fromCSV(cls, path, labelColumn, delimiter=";", columns=None, allowDecodeErrors=False) -> "IndexedTable":
+        if columns is None:
+            content, decodeErrorRows = readCSVcontent(path, delimiter)
+        else:
+            with openCSV(path) as file:
+                header = splitRow(decodeRow(readRow(file, delimiter)), delimiter)
+            neededColumns = getLabelColumns(labelColumn, header) + list(columns)
+            missingColumns = [colName for colName in neededColumns if colName not in header]
+            if missingColumns:
+                raise ComparatorError(f"the column(s) {missingColumns} are not present in {path}")
+            colIndices = sorted(getColPositions([header.index(colName) for colName in neededColumns]))
+            content, errorRows = readCSVcolumns(path, delimiter, colIndices)
+            # the table only knows the loaded columns, so its header matches the positions in the rows
+            content[0] = [header[col] for col in colIndices]
+            decodeErrorRows = list(errorRows)
+
+        if decodeErrorRows and not allowDecodeErrors:
+            raise ComparatorError(f"{len(decodeErrorRows)} decode error(s) in {path} (rows {decodeErrorRows[:10]})")
+        return cls(content, labelColumn, path, decodeErrorRows)
+
+    # builds a table from a header and rows which are already in memory
+    @classmethod
+    def fromRows(cls, header, rows, labelColumn) -> "IndexedTable":
+        return cls([list(header)] + [list(row) for row in rows], labelColumn)
+
+    @property
+    def labels(self):
+        return self.labelIndexDic.keys()
+
+    # returns the row of the first occurrence of a label as {column name: value}
+    def row(self, label) -> Dict[str, str]:
+        if label not in self.labelIndexDic:
+            raise KeyError(label)
+        row = self.content[self.labelIndexDic[label]]
+        return {colName: row[index] for colName, index in self.colNameDic.items()}
+
+    # returns rows, distinct labels, labels with duplicates, repeated rows, the most occurrences of one label
+    # and for a composite label the distinct values of every label column (see getKeyStatistics)
+    def keyStatistics(self) -> Dict[str, object]:
+        return getKeyStatistics(self.labelIndexDic, self.duplicates, getLabelColumns(self.labelColumn, self.header))
+
+    def __len__(self):
+        return len(self.labelIndexDic)
+
+    def __repr__(self):
+        return f"IndexedTable({self.path or 'in memory'}, {len(self.header)} columns, {len(self)} labels)"
+
+
+# the result of compare: the wrong values (same dic as compareValues), the unique labels and duplicates of both tables
+class ComparisonResult:
+
+    def __init__(self, wrongValues, colPairs, tableA, tableB, comparedLabels):
+        self.wrongValues = wrongValues
+        self.colPairs = colPairs
+        self.comparedLabels = comparedLabels
+        self.uniqueLabelsA = tableA.labels - tableB.labels
+        self.uniqueLabelsB = tableB.labels - tableA.labels
+        self.duplicatesA = tableA.duplicates
+        self.duplicatesB = tableB.duplicates
+        self.labelColumns = [tableA.labelColumn, tableB.labelColumn]
+        self.rowIndexDics = (tableA.labelIndexDic, tableB.labelIndexDic)
+
+    @property
+    def identical(self) -> bool:
+        return not self.wrongValues
+
+    @property
+    def wrongValueCount(self) -> int:
+        return countWrongValues(self.wrongValues)
+
+    # yields one record (label, col1, col2, value1, value2, row1, row2) per wrong value, sorted by label
+    def records(self) -> Iterator[tuple]:
+        for label in sorted(self.wrongValues):
+            yield from getResultRecords(label, self.wrongValues[label], self.rowIndexDics)
+
+    # writes the same TXT / CSV / result files as the script (see writeReports), returns the number of wrong values.
+    # a missing directory or parquet without pyarrow raise a ComparatorError, a file which cannot be written its OSError
+    def save(self, txtDirPath=None, csvDirPath=None, resultsDirPath=None, resultFormat="ndjson", fileName=None) -> int:
+        _, wrongValuesCounter = writeReports(sorted(self.wrongValues.items()), [self.labelColumns] + self.colPairs,
+                                             txtDirPath, csvDirPath, fileName, toConsole=False,
+                                             resultsDirPath=resultsDirPath, resultFormat=resultFormat,
+                                             rowIndexDics=self.rowIndexDics)
+        return wrongValuesCounter
+
+    def __repr__(self):
+        return f"ComparisonResult({self.comparedLabels} compared labels, {self.wrongValueCount} wrong values)"
+
+
+# compares the values of all column pairs [[colNameA, colNameB], ...] of the labels that are in both tables.
+# without pairs all columns with the same name in both tables are compared (like -acp).
+# rules are the compare rules of all pairs (like -cr), a pair can have its own rules as third entry.
+# values in ignoreValues are never reported and numpyBackend compares whole columns at once (requires numpy)
+def compare(tableA, tableB, pairs=None, ignoreValues=(), rules=None, numpyBackend=False) -> ComparisonResult:
+    labelColumnNames = [tableA.labelColumn, tableB.labelColumn]
+    colPairs = [list(pair) for pair in pairs] if pairs is not None else \
+        getColPairs(None, True, tableA.header, tableB.header, labelColumnNames)
+    for pair in colPairs:
+        if len(pair) not in [2, 3]:
+            raise ComparatorError(f"the column pair {pair} has to be [colNameA, colNameB] or [colNameA, colNameB, rules]")
+    colPairs = applyCompareRules(colPairs, rules)
+    if numpyBackend and np is None:
+        raise ComparatorError("the numpy backend requires numpy, install it with: pip install numpy")
+
+    colNameDicA = getColNameIndexDic(colPairs, [tableA.header], 1)
+    colNameDicB = getColNameIndexDic(colPairs, [tableB.header], 2)
+
+    labelIntersection = tableA.labels & tableB.labels
+    compareFunction = compareValuesColumnar if numpyBackend else compareValues
+    wrongValues = compareFunction(colPairs, labelIntersection, tableA.content, tableB.content, tableA.labelIndexDic,
+                                  tableB.labelIndexDic, colNameDicA, colNameDicB, list(ignoreValues))
+    return ComparisonResult(wrongValues, colPairs, tableA, tableB, len(labelIntersection))
@@ -0,0 +1,291 @@
+# This Script benchmarks the stages of the CSVcomparator on synthetic file pairs.
+# It generates two CSV files with a given number of rows and columns and a given rate of wrong values,
+# repeated labels, unique labels and text cells. Then it times every stage of the comparison
+# (loading, label indexing and comparing) and records the peak memory of the process. The parsing throughput of the
+# quote-aware parser (default) is measured against the raw splitter (-rp) on the same file and on a gzip compressed copy.
+
+# The results are written as JSON, so the results of two versions can be compared to catch regressions.
+
+# The script is used with the following commands:
+# python3 benchmark.py
+
+# optionals:
+# -r   number of rows per file (default 100000)
+# -c   number of compared columns (default 20)
+# -mr  rate of wrong values per cell (default 0.01)
+# -dr  rate of repeated labels (default 0.001)
+# -ur  rate of labels that are unique to one file (default 0.01)
+# -tr  rate of cells that are text instead of numbers (default 0.1)
+# -qr  rate of text cells that are quoted and contain the delimiter (default 0.0)
+# -n   number of repetitions, the fastest run of each stage is reported (default 3)
+# -ps  measures the comparison with the pre-screen (-ps of the CSVcomparator)
+# -o   "pathToResult.json"
+# -b   "pathToBaselineResult.json" compares the result to a previous result and exits with 1 on a regression
+
+# COPYRIGHT © 2024 Niklas Max G.
+# This work is licensed under the Creative Commons Attribution-NonCommercial 4.0 International License.
+# More details at: https://github.com/AbUndMax/CSVcomparator-Batch-Program/blob/main/LICENSE.md
+# For a quick overview, visit https://creativecommons.org/licenses/by-nc/4.0/
+
+import argparse
+import gzip
+import json
+import os
+import platform
+import random
+import shutil
+import sys
+import tempfile
+import time
+from datetime import datetime
+from typing import Dict, List, Tuple
+
+from CSVcomparator import (loadCSVcontent, readCSVheader, readCSVcontent, iterRows, decodeRow, splitRow, parsingOptions,
+                           getColPairs, getColNameIndexDic, getNeededColIndices, getColPositions, getLabelSetAndIndexDic,
+                           preScreenLabels, compareValues, compareValuesColumnar, countWrongValues, peakRssMB, np)
+
+# version of the result format
+RESULT_VERSION = 1
+
+# words used for the text cells of the synthetic files
+TEXT_VALUES = ["alpha", "beta", "gamma", "delta", "Null", "n.a.", "positive", "negative"]
+
+
+# writes a synthetic file pair into dirPath and returns the paths of both files
+def generateFilePair(dirPath, rows, cols, mismatchRate, duplicateRate, uniqueLabelRate, textRate, quoteRate=0.0,
+                     seed=42) -> List[str]:
+    rng = random.Random(seed)
+    header = ["label"] + [f"col{j}" for j in range(cols)]
+
+    def randomCell():
+        if rng.random() < textRate:
+            if rng.random() < quoteRate:
+                return f'"{rng.choice(TEXT_VALUES)};{rng.choice(TEXT_VALUES)}"'
+            return rng.choice(TEXT_VALUES)
+        return f"{rng.uniform(0, 100000):.2f}"
+
+    path1 = os.path.join(dirPath, "benchmark_file1.csv")
+    path2 = os.path.join(dirPath, "benchmark_file2.csv")
+    with open(path1, "w") as file1, open(path2, "w") as file2:
+        file1.write(";".join(header) + "\n")
+        file2.write(";".join(header) + "\n")
+        for i in range(rows):
+            row1 = [f"L{i:09d}"] + [randomCell() for _ in range(cols)]
+            row2 = list(row1)
+            if rng.random() < uniqueLabelRate:
+                row2[0] = f"U{i:09d}" # the label of file 1 is missing in file 2 and the other way round
+            for j in range(1, cols + 1):
+                if rng.random() < mismatchRate:
+                    row2[j] = randomCell()
+            file1.write(";".join(row1) + "\n")
+            file2.write(";".join(row2) + "\n")
+            if rng.random() < duplicateRate:
+                file1.write(";".join(row1) + "\n")
+                file2.write(";".join(row2) + "\n")
+
+    return [path1, path2]
+
+
+# runs all stages of the comparison once, returns {stage: seconds} and some counts of the run.
+# with preScreen the rows are hashed while loading and only the labels with different rows are compared (as with -ps)
+def runStages(path1, path2, backend, preScreen=False) -> Tuple[Dict[str, float], Dict[str, int]]:
+    seconds = {}
+    labelColumnNames = ["label", "label"]
+
+    start = time.perf_counter()
+    headerFile1 = readCSVheader(path1, ";")
+    headerFile2 = readCSVheader(path2, ";")
+    colPairs = getColPairs(None, True, headerFile1, headerFile2, labelColumnNames)
+    neededColIndicesFile1 = getNeededColIndices(headerFile1, "label", getColNameIndexDic(colPairs, [headerFile1], 1))
+    neededColIndicesFile2 = getNeededColIndices(headerFile2, "label", getColNameIndexDic(colPairs, [headerFile2], 2))
+    colPositionsFile1 = getColPositions(neededColIndicesFile1)
+    colPositionsFile2 = getColPositions(neededColIndicesFile2)
+    colNameDicFile1 = getColNameIndexDic(colPairs, [headerFile1], 1, colPositionsFile1)
+    colNameDicFile2 = getColNameIndexDic(colPairs, [headerFile2], 2, colPositionsFile2)
+    seconds["column pairs"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    rowHashesFile1 = [] if preScreen else None
+    rowHashesFile2 = [] if preScreen else None
+    file1Content, _ = loadCSVcontent(path1, ";", neededColIndicesFile1, rowHashesFile1)
+    file2Content, _ = loadCSVcontent(path2, ";", neededColIndicesFile2, rowHashesFile2)
+    seconds["load"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labelSetFile1, labelIndexDicFile1, _ = getLabelSetAndIndexDic(labelColumnNames, 1, file1Content, colPositionsFile1)
+    labelSetFile2, labelIndexDicFile2, _ = getLabelSetAndIndexDic(labelColumnNames, 2, file2Content, colPositionsFile2)
+    labelIntersection = labelSetFile1 & labelSetFile2
+    seconds["label index"] = time.perf_counter() - start
+
+    start = time.perf_counter()
+    labelsToCompare = labelIntersection
+    if preScreen:
+        labelsToCompare = preScreenLabels(labelIntersection, labelIndexDicFile1, labelIndexDicFile2, rowHashesFile1,
+                                          rowHashesFile2)
+    compare = compareValuesColumnar if backend == "numpy" else compareValues
+    wrongValues = compare(colPairs, labelsToCompare, file1Content, file2Content, labelIndexDicFile1,
+                          labelIndexDicFile2, colNameDicFile1, colNameDicFile2, ["Null"])
+    seconds["compare"] = time.perf_counter() - start
+
+    counts = {"compared labels": len(labelIntersection), "column pairs": len(colPairs),
+              "wrong values": countWrongValues(wrongValues)}
+    return seconds, counts
+
+
+# returns the parsing throughput in MB/s of the quote-aware parser and of the raw splitter (-rp), each for reading the
+# whole file (readCSVcontent) and for streaming it row by row (as the stream mode and the merge engine do),
+# and of reading a gzip compressed copy of the file (in MB/s of the decompressed file)
+def measureParsing(path, repetitions) -> Dict[str, float]:
+    sizeMB = os.path.getsize(path) / (1024 * 1024)
+
+    def streamRows():
+        with open(path, "rb") as file:
+            for row in iterRows(file, ";"):
+                splitRow(decodeRow(row), ";")
+
+    gzipPath = path + ".gz"
+    with open(path, "rb") as file, gzip.open(gzipPath, "wb", compresslevel=1) as gzipFile:
+        shutil.copyfileobj(file, gzipFile)
+
+    throughput = {}
+    for mode, raw in [("quoted", False), ("raw", True)]:
+        parsingOptions["raw"] = raw
+        for reader, parse in [("", lambda: readCSVcontent(path, ";")), (" stream", streamRows),
+                              (" gzip", lambda: readCSVcontent(gzipPath, ";"))]:
+            seconds = []
+            for _ in range(repetitions):
+                start = time.perf_counter()
+                parse()
+                seconds.append(time.perf_counter() - start)
+            throughput[f"{mode}{reader} MB/s"] = round(sizeMB / min(seconds), 1)
+    parsingOptions["raw"] = False
+    return throughput
+
+
+# runs the benchmark and returns the result as dic
+def runBenchmark(args) -> Dict[str, object]:
+    parameters = {"rows": args.rows, "columns": args.columns, "mismatch rate": args.mismatchRate,
+                  "duplicate rate": args.duplicateRate, "unique label rate": args.uniqueLabelRate,
+                  "text rate": args.textRate, "quote rate": args.quoteRate, "repetitions": args.repetitions,
+                  "backend": args.backend, "pre-screen": args.preScreen}
+    result = {"version": RESULT_VERSION, "timestamp": datetime.now().isoformat(timespec="seconds"),
+              "python": platform.python_version(), "platform": platform.platform(), "parameters": parameters}
+
+    with tempfile.TemporaryDirectory(dir=args.tempDir) as tmpDir:
+        start = time.perf_counter()
+        path1, path2 = generateFilePair(tmpDir, args.rows, args.columns, args.mismatchRate, args.duplicateRate,
+                                        args.uniqueLabelRate, args.textRate, args.quoteRate)
+        result["generate seconds"] = round(time.perf_counter() - start, 3)
+        result["file size MB"] = round((os.path.getsize(path1) + os.path.getsize(path2)) / (1024 * 1024), 1)
+
+        stages = {}
+        for _ in range(args.repetitions):
+            seconds, counts = runStages(path1, path2, args.backend, args.preScreen)
+            for stage, stageSeconds in seconds.items():
+                # the fastest repetition is the least disturbed one
+                stages[stage] = min(stages.get(stage, stageSeconds), stageSeconds)
+        result["parsing"] = measureParsing(path1, args.repetitions)
+
+    result["stages"] = {stage: round(stageSeconds, 4) for stage, stageSeconds in stages.items()}
+    result["total seconds"] = round(sum(stages.values()), 4)
+    result["peak RSS MB"] = peakRssMB()
+    result["counts"] = counts
+    return result
+
+
+# compares the result with a baseline result, returns the list of stages (and parsing throughputs)
+# that got slower than the tolerance allows. A baseline that was measured with other parameters or another python
+# version can not be compared, then a ValueError is raised
+def findRegressions(result, baseline, tolerance) -> List[str]:
+    baselineSettings = {**baseline.get("parameters", {}), "python": baseline.get("python")}
+    settings = {**result["parameters"], "python": result["python"]}
+    mismatches = [f"{name} {baselineSettings.get(name)} instead of {settings.get(name)}"
+                  for name in {**baselineSettings, **settings} if baselineSettings.get(name) != settings.get(name)]
+    if mismatches:
+        raise ValueError("the baseline was measured with other settings: " + ", ".join(mismatches))
+
+    regressions = []
+    for stage, stageSeconds in result["stages"].items():
+        baselineSeconds = baseline.get("stages", {}).get(stage)
+        if baselineSeconds and stageSeconds > baselineSeconds * (1 + tolerance):
+            regressions.append(f"{stage}: {baselineSeconds}s -> {stageSeconds}s")
+    for reader, throughput in result.get("parsing", {}).items():
+        baselineThroughput = baseline.get("parsing", {}).get(reader)
+        if baselineThroughput and throughput < baselineThroughput * (1 - tolerance):
+            regressions.append(f"parsing {reader}: {baselineThroughput} -> {throughput}")
+    baselineRss = baseline.get("peak RSS MB")
+    if baselineRss and result["peak RSS MB"] > baselineRss * (1 + tolerance):
+        regressions.append(f"peak RSS: {baselineRss}MB -> {result['peak RSS MB']}MB")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark of the CSV comparator on synthetic file pairs")
+    parser.add_argument("-r", "--rows", type=int, default=100_000, help="number of rows per file (default is 100000)")
+    parser.add_argument("-c", "--columns", type=int, default=20, help="number of compared columns (default is 20)")
+    parser.add_argument("-mr", "--mismatchRate", type=float, default=0.01,
+                        help="rate of cells with a wrong value (default is 0.01)")
+    parser.add_argument("-dr", "--duplicateRate", type=float, default=0.001,
+                        help="rate of rows whose label is repeated (default is 0.001)")
+    parser.add_argument("-ur", "--uniqueLabelRate", type=float, default=0.01,
+                        help="rate of labels that are unique to one file (default is 0.01)")
+    parser.add_argument("-tr", "--textRate", type=float, default=0.1,
+                        help="rate of cells that are text instead of numbers (default is 0.1)")
+    parser.add_argument("-qr", "--quoteRate", type=float, default=0.0,
+                        help="rate of text cells that are quoted and contain the delimiter (default is 0.0)")
+    parser.add_argument("-n", "--repetitions", type=int, default=3,
+                        help="number of repetitions, the fastest run of each stage is reported (default is 3)")
+    parser.add_argument("-be", "--backend", type=str, choices=["python", "numpy"], default="python",
+                        help="backend used in the compare stage (default is 'python')")
+    parser.add_argument("-ps", "--preScreen", action="store_true",
+                        help="hashes the rows while loading and only compares the labels with different rows (as -ps)")
+    parser.add_argument("-td", "--tempDir", type=str, help="directory in which the synthetic files are generated")
+    parser.add_argument("-o", "--output", type=str, help="path of the file in which the result is saved as JSON")
+    parser.add_argument("-b", "--baseline", type=str,
+                        help="path to a previous result, the script exits with 1 if a stage got slower than the tolerance")
+    parser.add_argument("-t", "--tolerance", type=float, default=0.2,
+                        help="allowed slowdown compared to the baseline (default is 0.2 = 20%%)")
+
+    args = parser.parse_args()
+
+    if args.repetitions < 1:
+        parser.error("\n > -n/--repetitions has to be at least 1")
+
+    if args.backend == "numpy" and np is None:
+        parser.error("\n > the numpy backend requires numpy, install it with: pip install numpy")
+
+    result = runBenchmark(args)
+    print(json.dumps(result, indent=2))
+
+    if args.output is not None:
+        try:
+            with open(args.output, "w") as file:
+                json.dump(result, file, indent=2)
+        except Exception as e:
+            print(f"<<<<<<! ERROR: could not save the result: {e} !>>>>>>")
+            sys.exit(1)
+        print("\nsuccessfully saved the result to: " + args.output)
+
+    if args.baseline is not None:
+        try:
+            with open(args.baseline, "r") as file:
+                baseline = json.load(file)
+        except Exception as e:
+            print(f"<<<<<<! the baseline {args.baseline} could not be loaded: {e} !>>>>>>")
+            sys.exit(1)
+
+        try:
+            regressions = findRegressions(result, baseline, args.tolerance)
+        except ValueError as e:
+            print(f"<<<<<<! {e} !>>>>>>")
+            sys.exit(1)
+        if regressions:
+            print("\n<<<<<<! regression compared to the baseline !>>>>>>")
+            for regression in regressions:
+                print("> " + regression)
+            sys.exit(1)
+        print("\n### no regression compared to the baseline ###")
+
+
+if __name__ == "__main__":
+    main()